@@ -3,10 +3,13 @@ Gold Portfolio Tracker - Backend API
 Fetches gold prices from Galeri24.co.id and manages portfolio
 """
 
-from flask import Flask, jsonify, request, send_from_directory, Response
+import time
+# Startup time is measured from here to the end of warm-up (see STARTUP_BUDGET)
+_STARTED = time.monotonic()
+
+from flask import Blueprint, Flask, jsonify, request, send_from_directory, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import requests
-from bs4 import BeautifulSoup
 from decimal import Decimal
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -14,18 +17,24 @@ import json
 import os
 import csv
 import io
+import threading
 import database as db
-from apscheduler.schedulers.background import BackgroundScheduler
-import atexit
+from parsers import VENDOR_ID
+from price_cache import PriceCache
+from price_table import PriceTable
+from warmup import WarmUp
+
+class PriceJSONProvider(DefaultJSONProvider):
+    """Serialize PriceTable through its own (memoized) JSON shape"""
 
-app = Flask(__name__, static_folder='static')
-CORS(app)
+    @staticmethod
+    def default(o):
+        if isinstance(o, PriceTable):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
 
+bp = Blueprint('api', __name__)
 
-def clean_price(price_str):
-    """Clean price string like 'Rp1.041.000' -> Decimal('1041000')"""
-    price_str = price_str.replace("Rp", "").replace(".", "").replace(",", "").strip()
-    return Decimal(price_str)
 
 def decimal_to_float(obj):
     """Convert Decimal to float for JSON serialization"""
@@ -33,65 +42,48 @@ def decimal_to_float(obj):
         return float(obj)
     raise TypeError
 
-def get_gold_prices():
-    """Fetch current gold prices from Galeri24.co.id"""
-    url = "https://galeri24.co.id/harga-emas"
+def parse_quantity(value, default=1):
+    """Number of bars from a request field: a whole number of at least 1
     
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        galeri24_div = soup.find("div", {"id": "GALERI 24"})
-        
-        if not galeri24_div:
-            return None
-            
-        main_container = galeri24_div.find("div", class_="grid divide-neutral-200 border-neutral-200")
-        
-        if not main_container:
-            return None
-            
-        rows = main_container.find_all("div", class_="grid grid-cols-5 divide-x lg:hover:bg-neutral-50 transition-all")
-        
-        gold_prices = {}
-        
-        for row in rows:
-            cols = row.find_all("div", class_="p-3 col-span-1 whitespace-nowrap w-fit") + \
-                   row.find_all("div", class_="p-3 col-span-2 whitespace-nowrap w-fit")
-            cols_text = [col.get_text(strip=True) for col in cols]
-            
-            if len(cols_text) == 3:
-                weight = float(cols_text[0])
-                sell_price = float(clean_price(cols_text[1]))
-                buy_price = float(clean_price(cols_text[2]))
-                spread_pct = ((sell_price - buy_price) / buy_price * 100) if buy_price else 0
-                
-                gold_prices[str(weight)] = {
-                    "weight": weight,
-                    "sell": sell_price,
-                    "buy": buy_price,
-                    "spread_pct": round(spread_pct, 2)
-                }
-        
-        tz = ZoneInfo("Asia/Jakarta")
-        last_update = datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')
-        
-        return {
-            "success": True,
-            "last_update": last_update,
-            "timezone": "Asia/Jakarta (GMT+7)",
-            "data": gold_prices
-        }
-        
-    except Exception as e:
+    A missing or null field gives default; anything else raises ValueError.
+    """
+    if value is None:
+        return default
+    if isinstance(value, str) and value.strip().isdigit():
+        quantity = int(value)
+    elif isinstance(value, int) and not isinstance(value, bool):
+        quantity = value
+    elif isinstance(value, float) and value.is_integer():
+        quantity = int(value)
+    else:
+        quantity = 0
+    if quantity < 1:
+        raise ValueError("quantity must be a whole number of bars, at least 1")
+    return quantity
+
+def get_latest_prices():
+    """Latest price snapshot stored by the ingestion worker (ingest.py)"""
+    snapshot = db.get_latest_price_snapshot()
+    if snapshot is None:
         return {
             "success": False,
-            "error": str(e)
+            "error": "No prices recorded yet, is the ingestion worker running?"
         }
+    
+    vendors = {vendor: PriceTable.from_dict(data) for vendor, data in snapshot["vendors"].items()}
+    return {
+        "success": True,
+        "snapshot_id": snapshot["id"],
+        "last_update": snapshot["fetched_at"],
+        "timezone": "Asia/Jakarta (GMT+7)",
+        "data": vendors.get(VENDOR_ID, PriceTable()),
+        "vendors": vendors,
+        "carried_over": snapshot["carried_over"]
+    }
+
+# Routes read the ingestion worker's latest snapshot through this in-memory
+# cache, so serving prices never waits on galeri24
+price_cache = PriceCache(get_latest_prices)
 
 def load_portfolio():
     """Load portfolio from database"""
@@ -102,80 +94,93 @@ def save_portfolio(portfolio):
     # This is now handled by individual save operations
     pass
 
-# ============ SCHEDULER SETUP ============
-# Initialize background scheduler for hourly price tracking
-scheduler = BackgroundScheduler(timezone="Asia/Jakarta")
-
-def record_hourly_price():
-    """Background job: Fetch and record 1 gram gold price if changed"""
-    try:
-        prices = get_gold_prices()
-        if prices and prices.get("success"):
-            data = prices.get("data", {})
-            # Get 1 gram price (try both "1.0" and "1" keys)
-            one_gram = data.get("1.0") or data.get("1")
-            if one_gram:
-                changed = db.save_price_history(
-                    weight=1.0,
-                    sell_price=one_gram["sell"],
-                    buy_price=one_gram["buy"]
-                )
-                if changed:
-                    print(f"✅ Price updated at {datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H:%M:%S')}: Sell={one_gram['sell']}, Buy={one_gram['buy']}")
-                else:
-                    print(f"ℹ️  Price unchanged at {datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H:%M:%S')}")
-    except Exception as e:
-        print(f"❌ Price recording error: {e}")
+# Hosts without a separate worker process (Railway, Render's free plan) run
+# the ingestion lease loop inside the web process; the lease keeps it to one
+# active scheduler however many web workers there are
+INGEST_IN_PROCESS = os.environ.get('INGEST_IN_PROCESS', 'False').lower() == 'true'
+_ingest_pid = None
 
-# Schedule hourly price check (at 1 minute past every hour: 9:01:00, 10:01:00, 11:01:00, etc.)
-scheduler.add_job(
-    func=record_hourly_price,
-    trigger="cron",
-    minute=1,  # Run at XX:01:00
-    second=0,  # Precisely at 0 seconds
-    id="hourly_price_check",
-    replace_existing=True
-)
+def start_ingest():
+    """Run ingest.run in a background thread, once per process"""
+    global _ingest_pid
+    if _ingest_pid == os.getpid():
+        return
+    _ingest_pid = os.getpid()
+    import ingest
+    threading.Thread(target=ingest.run, args=(ingest.default_holder(),), daemon=True).start()
 
-# Start scheduler
-scheduler.start()
+# Schema setup and the first price load run in the background after startup,
+# so static files are served while the database is still being reached
+warm_up = WarmUp([db.ensure_db, price_cache.get] + ([start_ingest] if INGEST_IN_PROCESS else []),
+                 started=_STARTED)
 
-# Shutdown scheduler gracefully on app exit
-atexit.register(lambda: scheduler.shutdown())
-
-# Record price immediately on startup
-record_hourly_price()
+def create_app():
+    """Build the app without touching the database or network
+    
+    No thread is started here: under gunicorn --preload this runs in the
+    master, and a thread caught mid-warm-up at fork() would leave its locks
+    held forever in every worker. Warm-up starts with each process's first
+    request instead (health checks included).
+    """
+    app = Flask(__name__, static_folder='static')
+    app.json = PriceJSONProvider(app)
+    CORS(app)
+    app.register_blueprint(bp)
+    # Every process starts its own warm-up on its first request
+    app.before_request(warm_up.start)
+    # Each request borrows one pooled database connection for all its queries
+    app.before_request(db.begin_request)
+    app.teardown_request(db.end_request)
+    return app
 
 # ============== API ROUTES ==============
 
-@app.route('/')
+@bp.route('/')
 def serve_index():
     return send_from_directory('static', 'index.html')
 
-@app.route('/static/<path:path>')
+@bp.route('/static/<path:path>')
 def serve_static(path):
     return send_from_directory('static', path)
 
-@app.route('/api/prices', methods=['GET'])
+@bp.route('/api/health', methods=['GET'])
+def api_health():
+    """Readiness probe: 503 until warm-up has finished"""
+    status = {**warm_up.status(), "db_pool": db.pool_stats()}
+    return jsonify(status), 200 if status["ready"] else 503
+
+@bp.route('/api/prices', methods=['GET'])
 def api_get_prices():
-    """Get current gold prices"""
-    prices = get_gold_prices()
+    """Get current gold prices (GALERI 24 unless ?vendor= names another vendor)"""
+    vendor = request.args.get('vendor')
+    try:
+        # While warming up, answer from whatever is cached rather than wait on the database
+        prices = price_cache.get(vendor) if warm_up.ready else price_cache.peek(vendor)
+    except KeyError:
+        return jsonify({"success": False, "error": f"Unknown vendor: {vendor}"}), 404
+    if prices is None:
+        return jsonify({"success": False, "error": "Starting up, prices not loaded yet"}), 503, {"Retry-After": "1"}
     return jsonify(prices)
 
-@app.route('/api/portfolio', methods=['GET'])
+@bp.route('/api/portfolio', methods=['GET'])
 def api_get_portfolio():
     """Get user's portfolio"""
     portfolio = load_portfolio()
     return jsonify({"success": True, "data": portfolio})
 
-@app.route('/api/portfolio/holdings', methods=['POST'])
+@bp.route('/api/portfolio/holdings', methods=['POST'])
 def api_add_holding():
     """Add a new gold holding"""
     data = request.json
+    try:
+        quantity = parse_quantity(data.get('quantity'))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
     holding = {
         "id": datetime.now().strftime('%Y%m%d%H%M%S%f'),
         "weight": float(data.get('weight', 0)),
+        "quantity": quantity,
         "purchase_price": float(data.get('purchase_price', 0)),
         "purchase_date": data.get('purchase_date', datetime.now().strftime('%Y-%m-%d')),
         "notes": data.get('notes', ''),
@@ -190,6 +195,7 @@ def api_add_holding():
         "type": "BUY",
         "holding_id": holding["id"],
         "weight": holding["weight"],
+        "quantity": holding["quantity"],
         "price": holding["purchase_price"],
         "date": holding["purchase_date"],
         "timestamp": holding["created_at"]
@@ -197,28 +203,37 @@ def api_add_holding():
     
     return jsonify({"success": True, "data": holding})
 
-@app.route('/api/portfolio/holdings/<holding_id>', methods=['DELETE'])
+@bp.route('/api/portfolio/holdings/<holding_id>', methods=['DELETE'])
 def api_delete_holding(holding_id):
-    """Delete a gold holding (sell or delete)"""
+    """Delete a gold holding (sell or delete), or only "quantity" bars of the lot"""
     data = request.json or {}
-    sell_price = data.get('sell_price', 0)
+    sell_price = data.get('sell_price', 0)  # per bar
+    try:
+        quantity = parse_quantity(data.get('quantity'), default=None)  # bars sold, default the whole lot
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
     # Delete from database
-    deleted = db.delete_holding(holding_id, record_transaction=True, sell_price=sell_price)
+    deleted = db.delete_holding(holding_id, record_transaction=True, sell_price=sell_price, quantity=quantity)
     
     if deleted:
         msg = "Holding sold successfully" if sell_price > 0 else "Holding deleted successfully"
-        return jsonify({"success": True, "message": msg})
+        return jsonify({"success": True, "message": msg, "sold_quantity": deleted["sold_quantity"]})
     
     return jsonify({"success": False, "error": "Holding not found"}), 404
 
-@app.route('/api/portfolio/holdings/<holding_id>', methods=['PUT'])
+@bp.route('/api/portfolio/holdings/<holding_id>', methods=['PUT'])
 def api_update_holding(holding_id):
     """Update a gold holding"""
     data = request.json
+    try:
+        quantity = parse_quantity(data.get('quantity'), default=None)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
     updates = {
         "weight": float(data.get('weight', 0)),
+        "quantity": quantity,
         "purchase_price": float(data.get('purchase_price', 0)),
         "purchase_date": data.get('purchase_date', ''),
         "notes": data.get('notes', '')
@@ -233,7 +248,7 @@ def api_update_holding(holding_id):
     
     return jsonify({"success": False, "error": "Holding not found"}), 404
 
-@app.route('/api/portfolio/export', methods=['GET'])
+@bp.route('/api/portfolio/export', methods=['GET'])
 def api_export_portfolio():
     """Export portfolio to CSV"""
     csv_data = db.export_to_csv()
@@ -243,7 +258,7 @@ def api_export_portfolio():
         headers={'Content-Disposition': 'attachment;filename=gold_portfolio.csv'}
     )
 
-@app.route('/api/portfolio/import', methods=['POST'])
+@bp.route('/api/portfolio/import', methods=['POST'])
 def api_import_holdings():
     """Import holdings from CSV or Excel file"""
     if 'file' not in request.files:
@@ -254,7 +269,7 @@ def api_import_holdings():
         return jsonify({"success": False, "error": "No file selected"}), 400
     
     filename = file.filename.lower()
-    imported_count = 0
+    holdings = []
     errors = []
     
     try:
@@ -323,13 +338,14 @@ def api_import_holdings():
                     price_str = price_str.replace(',', '').replace('.', '')
                 price_val = float(price_str) if price_str else 0
                 
-                # Parse quantity (default 1)
-                quantity_val = 1
-                if quantity:
-                    try:
-                        quantity_val = int(float(str(quantity)))
-                    except:
-                        quantity_val = 1
+                # Parse quantity (default 1), rejecting the row like the holdings API would
+                if isinstance(quantity, str) and not quantity.strip():
+                    quantity = None  # empty cell
+                try:
+                    quantity_val = parse_quantity(quantity)
+                except ValueError as e:
+                    errors.append(f"Row {i+2}: {e}")
+                    continue
                 
                 # Parse date
                 if date:
@@ -340,86 +356,75 @@ def api_import_holdings():
                 else:
                     date_str = datetime.now(ZoneInfo("Asia/Jakarta")).strftime('%Y-%m-%d')
                 
-                # Create holdings for each quantity
-                for q in range(quantity_val):
-                    holding = {
-                        "id": datetime.now().strftime('%Y%m%d%H%M%S%f') + str(i) + str(q),
-                        "weight": weight_val,
-                        "purchase_price": price_val,
-                        "purchase_date": date_str,
-                        "notes": str(notes) if notes else f"{weight_val}g",
-                        "created_at": datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
-                    }
-                    
-                    # Save to database
-                    db.save_holding(holding)
-                    db.save_transaction({
-                        "type": "BUY",
-                        "holding_id": holding["id"],
-                        "weight": holding["weight"],
-                        "price": holding["purchase_price"],
-                        "date": holding["purchase_date"],
-                        "timestamp": holding["created_at"]
-                    })
-                    imported_count += 1
+                # One lot per row, however many bars it holds
+                holdings.append({
+                    "id": datetime.now().strftime('%Y%m%d%H%M%S%f') + str(i),
+                    "weight": weight_val,
+                    "quantity": quantity_val,
+                    "purchase_price": price_val,
+                    "purchase_date": date_str,
+                    "notes": str(notes) if notes else f"{weight_val}g",
+                    "created_at": datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
+                })
                     
             except Exception as e:
                 errors.append(f"Row {i+2}: {str(e)}")
         
+        # Whole file parsed: write it in one transaction, all or nothing
+        stats = db.bulk_import_holdings(holdings)
+        print(f"📥 Imported {stats['rows']} holding(s) in {stats['seconds']}s ({stats['rows_per_sec']} rows/s)")
+        
         return jsonify({
             "success": True,
-            "imported": imported_count,
+            "imported": stats["rows"],
+            "bars": sum(h["quantity"] for h in holdings),
+            "seconds": stats["seconds"],
+            "rows_per_sec": stats["rows_per_sec"],
             "errors": errors[:10]  # Limit errors shown
         })
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/portfolio/summary', methods=['GET'])
+@bp.route('/api/portfolio/summary', methods=['GET'])
 def api_portfolio_summary():
     """Get portfolio summary with current valuations"""
     portfolio = load_portfolio()
-    prices = get_gold_prices()
+    prices = price_cache.get()
     
-    if not prices.get("success"):
+    if not prices or not prices.get("success"):
         return jsonify({"success": False, "error": "Could not fetch current prices"})
     
     total_weight = 0
     total_cost = 0
     total_current_value = 0
     holdings_with_values = []
+    # Per-gram curve across the listed bar sizes, computed once per snapshot
+    curve = prices["data"].curve()
     
     for holding in portfolio["holdings"]:
         weight = holding["weight"]
-        cost = holding["purchase_price"]
+        quantity = holding["quantity"]
+        # Per-bar purchase price; the lot is valued as a whole
+        cost = holding["purchase_price"] * quantity
         
-        # Find matching price or estimate per gram
-        price_key = str(weight)
-        if price_key in prices["data"]:
-            current_sell = prices["data"][price_key]["sell"]
-            current_buy = prices["data"][price_key]["buy"]
-        else:
-            # Estimate using 1 gram price
-            per_gram = prices["data"].get("1.0", prices["data"].get("1", {}))
-            if per_gram:
-                current_sell = per_gram["sell"] * weight
-                current_buy = per_gram["buy"] * weight
-            else:
-                current_sell = 0
-                current_buy = 0
+        # Listed weights get their listed price, others are interpolated
+        bar_sell, bar_buy = curve.value(weight)
+        current_sell, current_buy = bar_sell * quantity, bar_buy * quantity
         
         profit_loss = current_buy - cost
         profit_loss_pct = ((current_buy - cost) / cost * 100) if cost > 0 else 0
         
         holdings_with_values.append({
             **holding,
+            "total_cost": cost,
             "current_sell": current_sell,
             "current_buy": current_buy,
             "profit_loss": profit_loss,
             "profit_loss_pct": round(profit_loss_pct, 2)
         })
         
-        total_weight += weight
+        total_weight += weight * quantity
         total_cost += cost
         total_current_value += current_buy
     
@@ -429,37 +434,50 @@ def api_portfolio_summary():
     return jsonify({
         "success": True,
         "prices_update": prices["last_update"],
+        "prices_cached_at": prices["cached_at"],
+        "prices_age": prices["age"],
         "summary": {
             "total_weight": round(total_weight, 2),
             "total_cost": round(total_cost, 0),
             "total_current_value": round(total_current_value, 0),
             "total_profit_loss": round(total_profit_loss, 0),
             "total_profit_loss_pct": round(total_profit_loss_pct, 2),
-            "holdings_count": len(portfolio["holdings"])
+            "holdings_count": len(portfolio["holdings"]),
+            "bars_count": sum(h["quantity"] for h in portfolio["holdings"])
         },
         "holdings": holdings_with_values,
         "transactions": portfolio["transactions"]
     })
 
-@app.route('/api/price-history', methods=['GET'])
+@bp.route('/api/price-history', methods=['GET'])
 def api_price_history():
-    """Get price history for 1 gram gold"""
+    """Get price history for one bar size (1 gram unless ?weight= says otherwise)"""
     days = request.args.get('days', default=30, type=int)
+    weight = request.args.get('weight', default=1.0, type=float)
     # Limit to reasonable range
     days = max(1, min(days, 365))
     
-    history = db.get_price_history(weight=1.0, days=days)
+    history = db.get_price_history(weight=weight, days=days)
     
     return jsonify({
         "success": True,
+        "weight": weight,
         "days": days,
         "count": len(history),
         "data": history
     })
 
+app = create_app()
+
 if __name__ == '__main__':
     # Create static folder if not exists
     os.makedirs('static', exist_ok=True)
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
+    # The dev server runs ingestion in-process by default so prices show up
+    # without a second terminal
+    if os.environ.get('INGEST_IN_PROCESS', 'True').lower() == 'true':
+        start_ingest()
+    # The dev server never forks, so warm up right away
+    warm_up.start()
     app.run(debug=debug, host='0.0.0.0', port=port)
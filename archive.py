@@ -0,0 +1,96 @@
+"""
+Page archive for Gold Portfolio Tracker
+Stores raw harga-emas responses compressed and deduplicated by content hash
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# zstd when available, gzip otherwise
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# Archive configuration
+PRICE_ARCHIVE_DIR = os.environ.get('PRICE_ARCHIVE_DIR', 'archive')
+# Set PRICE_ARCHIVE=1 to capture every downloaded price page
+PRICE_ARCHIVE = os.environ.get('PRICE_ARCHIVE', '').lower() in ('1', 'true', 'yes')
+
+
+class PriceArchive:
+    """Content-addressed page store with an append-only capture index
+
+    Each distinct body is written once as <sha256>.html.zst (or .html.gz);
+    index.jsonl gets one line per capture, so repeated pages still record
+    when they were seen.
+    """
+
+    def __init__(self, directory=PRICE_ARCHIVE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self._lock = threading.Lock()
+
+    def save(self, body, url='', fetched_at=None):
+        """Archive a raw response body; returns its content hash"""
+        digest = hashlib.sha256(body).hexdigest()
+        fetched_at = fetched_at or datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self._blob_path(digest) is None:
+                path = os.path.join(self.directory, digest + ('.html.zst' if HAS_ZSTD else '.html.gz'))
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(self._compress(body))
+                os.replace(tmp, path)
+
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"hash": digest, "fetched_at": fetched_at, "url": url, "size": len(body)}) + '\n')
+        return digest
+
+    def load(self, digest):
+        """Raw body of an archived page"""
+        path = self._blob_path(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            if not HAS_ZSTD:
+                raise RuntimeError("zstandard is needed to read .zst archives")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def entries(self):
+        """Capture index entries in the order they were recorded"""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def digests(self):
+        """Hashes of every distinct archived page"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name.split('.', 1)[0] for name in os.listdir(self.directory)
+                      if name.endswith(('.html.zst', '.html.gz')))
+
+    def _blob_path(self, digest):
+        for ext in ('.html.zst', '.html.gz'):
+            path = os.path.join(self.directory, digest + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _compress(body):
+        if HAS_ZSTD:
+            return zstandard.ZstdCompressor(level=19).compress(body)
+        return gzip.compress(body, compresslevel=9)
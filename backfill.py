@@ -0,0 +1,130 @@
+"""
+Missed-run recovery for Gold Portfolio Tracker
+Finds the hours the ingestion worker didn't poll (dyno asleep, restarts,
+outages) and fills them in one batch from archived price pages, marking the
+rest as known gaps
+"""
+
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import database as db
+from archive import PriceArchive
+from cadence import SCRAPE_MAX_INTERVAL
+from parsers import parse_gold_prices
+
+# How far back to look for missed hours
+BACKFILL_DAYS = int(os.environ.get('BACKFILL_DAYS', 7))
+# Runs further apart than this many planned max intervals leave a gap
+BACKFILL_SLACK = float(os.environ.get('BACKFILL_SLACK', 1.5))
+
+TZ = ZoneInfo("Asia/Jakarta")
+
+
+def hour_key(moment):
+    """'2024-05-01T09' for any moment in that Jakarta hour"""
+    return moment.astimezone(TZ).strftime('%Y-%m-%dT%H')
+
+
+def next_hour_key(key):
+    """Hour key of the hour after key"""
+    hour = datetime.strptime(key, '%Y-%m-%dT%H').replace(tzinfo=TZ)
+    return hour_key(hour + timedelta(hours=1))
+
+
+def find_gaps(runs, known, max_gap=SCRAPE_MAX_INTERVAL * BACKFILL_SLACK):
+    """Hour keys lying wholly between two runs more than max_gap seconds apart
+
+    runs are the worker's successful poll times in order; hours in known
+    were already backfilled or marked as gaps.
+    """
+    gaps = []
+    for before, after in zip(runs, runs[1:]):
+        if (after - before).total_seconds() <= max_gap:
+            continue
+        hour = before.astimezone(TZ).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        while hour + timedelta(hours=1) <= after:
+            key = hour_key(hour)
+            if key not in known:
+                gaps.append(key)
+            hour += timedelta(hours=1)
+    return gaps
+
+
+def backfill_gaps(archive=None, days=BACKFILL_DAYS, now=None):
+    """Fill every missed hour of the last N days from the archive in one transaction
+
+    Returns (backfilled hours, hours marked as known gaps).
+    """
+    archive = archive or PriceArchive()
+    now = now or datetime.now(TZ)
+    since = now - timedelta(days=days)
+
+    runs = [datetime.fromisoformat(ran_at) for ran_at in db.get_ingest_runs(since.isoformat())]
+    gaps = find_gaps(runs, db.get_known_gaps(hour_key(since)))
+    if not gaps:
+        return 0, 0
+
+    # Last archived capture of each missed hour
+    captures = {}
+    wanted = set(gaps)
+    for entry in archive.entries():
+        key = entry["fetched_at"][:13]
+        if key in wanted:
+            captures[key] = entry
+
+    history = []
+    statuses = []
+    previous = {}  # weight -> (sell, buy, timestamp) of the last row before the hour being filled
+    ranges = []  # [hour key after the range, {weight: index in history of its last row in the range}]
+    last_key = None
+    for key in gaps:
+        if last_key is None or key != next_hour_key(last_key):
+            # Live runs ended the previous range, so the baseline is whichever
+            # is later: their history or what this batch backfilled before them
+            for weight, row in db.get_prices_before(key).items():
+                if weight not in previous or row[2] > previous[weight][2]:
+                    previous[weight] = row
+            ranges.append([None, {}])
+        last_key = key
+        ranges[-1][0] = next_hour_key(key)
+        
+        entry = captures.get(key)
+        table = None
+        if entry is not None:
+            try:
+                table = parse_gold_prices(archive.load(entry["hash"]).decode('utf-8', errors='replace'))
+            except Exception as e:
+                print(f"❌ Could not backfill {key} from {entry['hash'][:12]}: {e}")
+        if not table:
+            statuses.append((key, 'missing'))
+            continue
+
+        for weight, sell, buy in zip(table.weights, table.sell, table.buy):
+            row = (float(sell), float(buy))
+            if previous.get(weight, (None, None))[:2] != row:
+                ranges[-1][1][weight] = len(history)
+                history.append((weight, row[0], row[1], entry["fetched_at"]))
+                previous[weight] = (*row, entry["fetched_at"])
+        statuses.append((key, 'backfilled'))
+    
+    # The live worker never saw the gap, so it recorded the first price after
+    # it as a change; a backfilled row just before that with the same price
+    # would repeat it
+    redundant = set()
+    for end, last_rows in ranges:
+        after = db.get_prices_after(end)
+        for weight, i in last_rows.items():
+            live = after.get(weight)
+            if live is None or live[:2] != history[i][1:3]:
+                continue
+            later = next((row for row in history[i + 1:] if row[0] == weight), None)
+            if later is None or later[3] > live[2]:
+                redundant.add(i)
+    history = [row for i, row in enumerate(history) if i not in redundant]
+
+    db.save_backfill(history, statuses)
+    backfilled = sum(1 for _, status in statuses if status == 'backfilled')
+    print(f"🩹 {len(gaps)} missed hour(s): {backfilled} backfilled from the archive "
+          f"({len(history)} price row(s)), {len(gaps) - backfilled} marked as gaps")
+    return backfilled, len(gaps) - backfilled
@@ -0,0 +1,123 @@
+"""
+Corpus benchmark and regression suite for Gold Portfolio Tracker
+Replays every page in the price archive (see archive.py, captured with
+PRICE_ARCHIVE=1) through the parser backends, reports throughput, p50/p99
+parse time and peak Python heap, and checks the parsed tables against the
+expectations stored next to the archive.
+
+Usage:
+    python benchmarks/bench_corpus.py --import benchmarks/pages/*.html
+    python benchmarks/bench_corpus.py --update-expectations
+    python benchmarks/bench_corpus.py [--backend selectolax] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers  # noqa: E402
+from archive import PriceArchive, PRICE_ARCHIVE_DIR  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def to_json(vendors):
+    """Parsed tables in the stored-expectation (API JSON) shape"""
+    return json.loads(json.dumps({vendor: table.to_dict() for vendor, table in vendors.items()}))
+
+
+def load_expectations(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_backend(backend, pages, runs):
+    """Returns (per-page parse times in seconds, wall time, peak heap bytes, results)"""
+    times = []
+    results = {}
+    wall = time.perf_counter()
+    for _ in range(runs):
+        for digest, html in pages:
+            start = time.perf_counter()
+            results[digest] = parsers.parse_vendor_prices(html, backend)
+            times.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall
+
+    # Separate pass: tracemalloc slows parsing down too much to time it
+    tracemalloc.start()
+    for _, html in pages:
+        parsers.parse_vendor_prices(html, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, wall, peak, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archive', default=PRICE_ARCHIVE_DIR)
+    parser.add_argument('--backend', action='append', choices=list(parsers.BACKENDS),
+                        help='backend(s) to run (default: all available)')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--import', dest='import_files', nargs='+', metavar='HTML',
+                        help='add saved pages to the archive and exit')
+    parser.add_argument('--update-expectations', action='store_true',
+                        help='store the html.parser reference output of every page as its expectation')
+    args = parser.parse_args()
+
+    archive = PriceArchive(args.archive)
+    expectations_path = os.path.join(args.archive, 'expectations.json')
+
+    if args.import_files:
+        for path in args.import_files:
+            with open(path, 'rb') as f:
+                digest = archive.save(f.read(), url=f"file:{os.path.basename(path)}")
+            print(f"{digest[:12]}  {path}")
+        return
+
+    pages = [(digest, archive.load(digest).decode('utf-8', errors='replace')) for digest in archive.digests()]
+    if not pages:
+        sys.exit(f"No archived pages in {args.archive}")
+    size = sum(len(html) for _, html in pages)
+    print(f"{len(pages)} archived page(s), {size / 1024:.0f} KiB of HTML")
+
+    expectations = load_expectations(expectations_path)
+    if args.update_expectations:
+        for digest, html in pages:
+            expectations[digest] = to_json(parsers.parse_vendor_prices(html, 'html.parser'))
+        with open(expectations_path, 'w', encoding='utf-8') as f:
+            json.dump(expectations, f, indent=1, sort_keys=True)
+        print(f"Stored expectations for {len(pages)} page(s) in {expectations_path}")
+
+    failed = False
+    print(f"\n{'backend':<12} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak KiB':>9}  check")
+    for backend in args.backend or list(parsers.BACKENDS):
+        times, wall, peak, results = run_backend(backend, pages, args.runs)
+        mismatched = [digest for digest, _ in pages
+                      if digest in expectations and to_json(results[digest]) != expectations[digest]]
+        unchecked = sum(1 for digest, _ in pages if digest not in expectations)
+        failed |= bool(mismatched)
+
+        check = f"{len(mismatched)} mismatch(es)" if mismatched else "ok"
+        if unchecked:
+            check += f", {unchecked} without expectations"
+        print(f"{backend:<12} {len(times) / wall:9.1f} {statistics.median(times) * 1000:8.2f} "
+              f"{percentile(times, 99) * 1000:8.2f} {peak / 1024:9.0f}  {check}")
+        for digest in mismatched[:5]:
+            print(f"    mismatch: {digest}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
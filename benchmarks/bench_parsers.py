@@ -0,0 +1,81 @@
+"""
+Parser benchmark for Gold Portfolio Tracker
+Times every available price-page parser backend on archived harga-emas pages
+and checks each one returns exactly what the html.parser reference does.
+The streaming parser is timed on the default vendor, where it stops early.
+
+Usage: python benchmarks/bench_parsers.py [--runs N] [page.html ...]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers  # noqa: E402
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+
+def bench(parse, runs):
+    """Best-of-runs parse time in milliseconds"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def stream_parse(body, chunk_size=8192):
+    """Feed the page like PRICE_SCRAPE_MODE=stream does; returns (table, bytes read)"""
+    parser = parsers.StreamingPriceParser()
+    read = 0
+    for i in range(0, len(body), chunk_size):
+        parser.feed(body[i:i + chunk_size])
+        read = min(i + chunk_size, len(body))
+        if parser.done:
+            break
+    return parser.result(), read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', help='HTML files (default: benchmarks/pages/*.html)')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))
+    if not pages:
+        sys.exit("No pages to benchmark")
+
+    failed = False
+    for path in pages:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        reference = parsers.parse_vendor_prices(html, 'html.parser')
+        baseline = None
+        print(f"\n{os.path.basename(path)} ({len(html) / 1024:.0f} KiB, {len(reference)} vendors)")
+        for backend in parsers.BACKENDS:
+            identical = parsers.parse_vendor_prices(html, backend) == reference
+            failed |= not identical
+            ms = bench(lambda: parsers.parse_vendor_prices(html, backend), args.runs)
+            baseline = baseline or ms
+            print(f"  {backend:<12} {ms:8.2f} ms  {baseline / ms:5.1f}x  {'ok' if identical else 'MISMATCH'}")
+
+        body = html.encode('utf-8')
+        table, read = stream_parse(body)
+        identical = table == reference.get(parsers.VENDOR_ID)
+        failed |= not identical
+        ms = bench(lambda: stream_parse(body), args.runs)
+        print(f"  {'stream':<12} {ms:8.2f} ms  {baseline / ms:5.1f}x  {'ok' if identical else 'MISMATCH'}"
+              f"  (read {read / len(body):.0%} of the page)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
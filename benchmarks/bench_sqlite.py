@@ -0,0 +1,110 @@
+"""
+SQLite profile benchmark for Gold Portfolio Tracker
+Runs writer processes (price history ticks and new holdings, like the
+ingestion worker and the import route) next to reader processes (the
+portfolio and price-history routes) against a fresh database, once per
+SQLITE_PROFILE, and reports throughput, read latency and lock errors.
+
+Usage:
+    python benchmarks/bench_sqlite.py [--writers 2] [--readers 4] [--seconds 5]
+    python benchmarks/bench_sqlite.py --profile default --profile tuned --pragmas mmap_size=0
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def worker(role, index, path, profile, pragmas, seconds, start_at, results):
+    # database reads its configuration at import, so set it up first
+    os.environ.update(DATABASE_FILE=path, SQLITE_PROFILE=profile, SQLITE_PRAGMAS=pragmas)
+    import database as db
+    db.ensure_db()
+
+    ops = errors = 0
+    latencies = []
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                # Every tick changes this writer's weight, so each one is an insert
+                db.save_price_history(weight=100.0 + index, sell_price=float(ops), buy_price=float(ops))
+                db.save_holding({"id": f"bench-{index}-{ops}", "weight": 1.0, "purchase_price": 1e6,
+                                 "purchase_date": "2024-01-01", "notes": "", "created_at": "2024-01-01"})
+            elif ops % 2:
+                db.load_portfolio()
+            else:
+                db.get_price_history(weight=100.0, days=30)
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            if 'locked' not in str(e).lower():
+                raise
+            errors += 1
+    results.put((role, ops, errors, latencies))
+
+
+def run_profile(profile, pragmas, writers, readers, seconds):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        start_at = time.time() + 2  # let every process import and connect first
+        procs = [ctx.Process(target=worker, args=('writer', i, path, profile, pragmas, seconds, start_at, results))
+                 for i in range(writers)]
+        procs += [ctx.Process(target=worker, args=('reader', i, path, profile, pragmas, seconds, start_at, results))
+                  for i in range(readers)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        rows = [row for row in collected if row[0] == role]
+        latencies = [lat for row in rows for lat in row[3]]
+        summary[role] = {
+            "ops": sum(row[1] for row in rows) / seconds,
+            "errors": sum(row[2] for row in rows),
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "p99": percentile(latencies, 99)
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', action='append', help='profile(s) to compare (default: default and tuned)')
+    parser.add_argument('--pragmas', default='', help='SQLITE_PRAGMAS overrides applied to every profile')
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer(s), {args.readers} reader(s), {args.seconds:.0f}s per profile\n")
+    print(f"{'profile':<10} {'role':<7} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7}")
+    for profile in args.profile or ['default', 'tuned']:
+        summary = run_profile(profile, args.pragmas, args.writers, args.readers, args.seconds)
+        for role, stats in summary.items():
+            print(f"{profile:<10} {role:<7} {stats['ops']:9.1f} {stats['p50'] * 1000:8.2f} "
+                  f"{stats['p99'] * 1000:8.2f} {stats['errors']:7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Startup benchmark for Gold Portfolio Tracker
+Cold-starts the web app in fresh interpreters and reports how long importing
+app takes, when the first static page and price response are served, and when
+warm-up reports ready. Fails if ready comes later than STARTUP_BUDGET.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--budget 2.0]
+    DATABASE_FILE=/tmp/bench.db python benchmarks/bench_startup.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from warmup import STARTUP_BUDGET  # noqa: E402
+
+# Runs in a fresh interpreter so every measurement is a cold import
+PROBE = '''
+import json, time
+start = time.monotonic()
+import app
+imported = time.monotonic()
+client = app.app.test_client()
+index = client.get('/')
+first_static = time.monotonic()
+prices = client.get('/api/prices')
+first_prices = time.monotonic()
+app.warm_up.wait(60)
+ready = time.monotonic()
+print(json.dumps({
+    "import": imported - start,
+    "first_static": first_static - start,
+    "first_prices": first_prices - start,
+    "prices_status": prices.status_code,
+    "ready": ready - start,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help='seconds until ready')
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+        # The app's own log lines (e.g. "Ready in") print from another thread and
+        # can land on either side of the result, even on the same line
+        runs.append(json.JSONDecoder().raw_decode(out.stdout, out.stdout.index('{"import"'))[0])
+
+    print(f"{args.runs} cold start(s), budget {args.budget:.2f}s until ready\n")
+    print(f"{'stage':<14} {'p50 ms':>8} {'max ms':>8}")
+    for stage in ('import', 'first_static', 'first_prices', 'ready'):
+        values = [run[stage] for run in runs]
+        print(f"{stage:<14} {statistics.median(values) * 1000:8.1f} {max(values) * 1000:8.1f}")
+    statuses = sorted({run['prices_status'] for run in runs})
+    print(f"\n/api/prices status during warm-up: {statuses}")
+
+    worst = max(run['ready'] for run in runs)
+    if worst > args.budget:
+        print(f"❌ Slowest start {worst:.2f}s is over the {args.budget:.2f}s budget")
+        sys.exit(1)
+    print(f"✅ Slowest start {worst:.2f}s is within the {args.budget:.2f}s budget")
+
+
+if __name__ == '__main__':
+    main()
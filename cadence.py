@@ -0,0 +1,129 @@
+"""
+Adaptive scrape cadence for Gold Portfolio Tracker
+Polls galeri24 more often in the hours its prices tend to change and backs
+off in quiet hours, within a daily upstream request budget
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from apscheduler.triggers.base import BaseTrigger
+
+# Cadence configuration
+SCRAPE_MIN_INTERVAL = float(os.environ.get('SCRAPE_MIN_INTERVAL', 300))    # busiest hours
+SCRAPE_MAX_INTERVAL = float(os.environ.get('SCRAPE_MAX_INTERVAL', 7200))   # quietest hours
+SCRAPE_DAILY_BUDGET = int(os.environ.get('SCRAPE_DAILY_BUDGET', 48))       # scrapes per day
+SCRAPE_HISTORY_DAYS = int(os.environ.get('SCRAPE_HISTORY_DAYS', 28))       # price_history window learned from
+# Pseudo-count of changes added to every hour, so one odd day doesn't reshape the schedule
+SCRAPE_PRIOR = float(os.environ.get('SCRAPE_PRIOR', 0.5))
+
+TZ = ZoneInfo("Asia/Jakarta")
+
+
+def plan_polls(change_counts, budget=SCRAPE_DAILY_BUDGET, min_interval=SCRAPE_MIN_INTERVAL,
+               max_interval=SCRAPE_MAX_INTERVAL, prior=SCRAPE_PRIOR):
+    """Polls per hour of day (24 floats) for the given price changes per hour
+
+    Every hour gets at least 3600 / max_interval polls; the rest of the budget
+    is shared out in proportion to how often prices changed in that hour,
+    capped at 3600 / min_interval, with whatever a capped hour can't use
+    going to the others.
+    """
+    floor = 3600 / max_interval
+    cap = 3600 / min_interval
+    polls = [floor] * 24
+    weights = [count + prior for count in change_counts]
+    spare = budget - floor * 24
+    open_hours = set(range(24))
+
+    while spare > 1e-9 and open_hours:
+        total = sum(weights[h] for h in open_hours)
+        given = 0.0
+        for h in list(open_hours):
+            extra = spare * weights[h] / total
+            if polls[h] + extra >= cap:
+                extra = cap - polls[h]
+                open_hours.discard(h)
+            polls[h] += extra
+            given += extra
+        spare -= given
+        if given <= 1e-9:
+            break
+    return polls
+
+
+class AdaptiveCadence:
+    """Learned poll schedule plus today's scrape count
+
+    load_changes returns price changes per hour of day (24 ints), normally
+    database.get_price_change_hours. The plan is relearned once a day.
+    """
+
+    def __init__(self, load_changes, budget=SCRAPE_DAILY_BUDGET, days=SCRAPE_HISTORY_DAYS):
+        self.load_changes = load_changes
+        self.budget = budget
+        self.days = days
+        self._lock = threading.Lock()
+        self._polls = None
+        self._planned_on = None
+        self._day = None
+        self._used = 0
+
+    def interval(self, now):
+        """Seconds between polls in the hour containing now"""
+        return 3600 / self._plan(now)[now.astimezone(TZ).hour]
+
+    def record(self, now=None):
+        """Count one upstream scrape against today's budget"""
+        now = (now or datetime.now(TZ)).astimezone(TZ)
+        with self._lock:
+            if self._day != now.date():
+                self._day, self._used = now.date(), 0
+            self._used += 1
+
+    def remaining(self, now):
+        with self._lock:
+            if self._day != now.astimezone(TZ).date():
+                return self.budget
+            return max(0, self.budget - self._used)
+
+    def next_poll(self, previous, now):
+        """When to scrape next: one interval after the previous poll, or tomorrow once the budget is spent"""
+        if previous is None:
+            return now
+        if self.remaining(now) <= 0:
+            local = now.astimezone(TZ)
+            return datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), TZ)
+        return max(now, previous + timedelta(seconds=self.interval(previous)))
+
+    def _plan(self, now):
+        today = now.astimezone(TZ).date()
+        with self._lock:
+            if self._planned_on == today:
+                return self._polls
+        try:
+            counts = self.load_changes(self.days)
+        except Exception as e:
+            print(f"❌ Could not learn scrape cadence: {e}")
+            counts = [0] * 24
+        polls = plan_polls(counts, self.budget)
+        with self._lock:
+            self._polls, self._planned_on = polls, today
+        busiest = max(range(24), key=polls.__getitem__)
+        print(f"📈 Scrape cadence: {sum(polls):.0f}/day, every {3600 / polls[busiest] / 60:.0f} min "
+              f"around {busiest:02d}:00, every {3600 / min(polls) / 60:.0f} min when quiet")
+        return polls
+
+
+class AdaptiveTrigger(BaseTrigger):
+    """APScheduler trigger that asks an AdaptiveCadence for each next run"""
+
+    def __init__(self, cadence):
+        self.cadence = cadence
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        return self.cadence.next_poll(previous_fire_time, now)
+
+    def __str__(self):
+        return 'adaptive'
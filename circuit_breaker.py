@@ -0,0 +1,77 @@
+"""
+Circuit breaker for Gold Portfolio Tracker
+Stops hammering Galeri24.co.id while it is down and backs off exponentially
+"""
+
+import os
+import threading
+import time
+
+# Circuit breaker configuration
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 3))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+CIRCUIT_MAX_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_MAX_RESET_TIMEOUT', 900))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe -> closed
+
+    Each time a half-open probe fails, the open period doubles, up to
+    max_reset_timeout. A success resets everything.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT,
+                 max_reset_timeout=CIRCUIT_MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._trips = 0  # consecutive times the circuit opened
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        """Whether a call may go upstream now; half-open lets a single probe through"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._retry_in() > 0:
+                return False
+            if self._probing:
+                return False
+            self._state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"⚠️  Circuit opened after {self._failures} failure(s)")
+                self._state = OPEN
+                self._trips += 1
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 when closed)"""
+        with self._lock:
+            return max(0.0, self._retry_in()) if self._state == OPEN else 0.0
+
+    def _retry_in(self):
+        timeout = min(self.reset_timeout * 2 ** max(self._trips - 1, 0), self.max_reset_timeout)
+        return self._opened_at + timeout - time.monotonic()
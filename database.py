@@ -5,6 +5,8 @@ Supports both local SQLite and Turso cloud database
 
 import os
 import json
+import queue
+import threading
 import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -25,9 +27,215 @@ except ImportError:
 TURSO_DATABASE_URL = os.environ.get('TURSO_DATABASE_URL')
 TURSO_AUTH_TOKEN = os.environ.get('TURSO_AUTH_TOKEN')
 LOCAL_DATABASE_FILE = os.environ.get('DATABASE_FILE', 'goldtracker.db')
+# Number of price snapshots kept (one per scrape with a price change)
+PRICE_SNAPSHOT_RETENTION = int(os.environ.get('PRICE_SNAPSHOT_RETENTION', 500))
+# Days of ingestion run times kept for gap detection (see backfill.py)
+INGEST_RUN_RETENTION_DAYS = int(os.environ.get('INGEST_RUN_RETENTION_DAYS', 30))
+# libsql connections kept open per process, how long a caller waits for one,
+# and the age in seconds after which one is reopened (Turso drops old streams)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 300))
+
+# PRAGMAs applied to every local SQLite connection. 'tuned' lets readers run
+# alongside the ingestion worker's writes (WAL) and fsyncs only at checkpoints
+# (synchronous=NORMAL, still safe against app crashes); 'default' is plain
+# SQLite. SQLITE_PRAGMAS overrides single values, e.g. "mmap_size=0,cache_size=-64000".
+SQLITE_PROFILES = {
+    'default': {},
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,  # bytes
+        'cache_size': -16000,            # negative = KiB, so ~16 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000            # ms
+    }
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'tuned')
+SQLITE_PRAGMAS = os.environ.get('SQLITE_PRAGMAS', '')
+
+# Tables are created lazily by the first get_db() of each process
+_db_ready = False
+_db_lock = threading.Lock()
+
+class PooledConnection:
+    """A borrowed connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self.opened_at = time.monotonic()
+        self.scoped = False  # held for a whole Flask request, see begin_request()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if not self.scoped:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Reuses connections instead of opening one per database call
+
+    sqlite3 connections stay in their thread (thread-local, one per thread);
+    libsql connections are shared through a bounded queue of size
+    connections, and callers wait when all are borrowed. stats() reports how
+    often and how long they waited.
+    """
+
+    def __init__(self, connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE,
+                 thread_local=not USING_LIBSQL):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.thread_local = thread_local
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._acquired = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked (gunicorn --preload): the parent's connections aren't ours to use
+                self._reset()
+            self._acquired += 1
+        if self.thread_local:
+            return self._acquire_local()
+        return self._acquire_shared()
+
+    def _acquire_local(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = PooledConnection(self, self.connect())
+            with self._lock:
+                self._opened += 1
+        elif conn._conn.in_transaction:
+            # A caller that raised before close() left its transaction open
+            conn._conn.rollback()
+        return conn
+
+    def _acquire_shared(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    return PooledConnection(self, self.connect())
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            conn = self._wait()
+
+        if time.monotonic() - conn.opened_at > self.recycle:
+            self._discard(conn)
+            return PooledConnection(self, self._reopen())
+        return conn
+
+    def _wait(self):
+        start = time.monotonic()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"No database connection free after {self.timeout:.0f}s (pool size {self.size})")
+        waited = time.monotonic() - start
+        with self._lock:
+            self._waited += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _reopen(self):
+        try:
+            return self.connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _discard(self, conn):
+        try:
+            conn._conn.close()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        # Never hand out a connection with someone else's half-done transaction
+        if getattr(conn._conn, 'in_transaction', False):
+            conn._conn.rollback()
+        if not self.thread_local and conn._pool is self and self._pid == os.getpid():
+            self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "thread_local" if self.thread_local else "shared",
+                "size": self.size,
+                "opened": self._opened,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waited": self._waited,
+                "wait_seconds_total": round(self._wait_total, 3),
+                "wait_seconds_max": round(self._wait_max, 3),
+                "timeouts": self._timeouts
+            }
+
 
 def get_db():
-    """Get database connection - Turso cloud or local SQLite"""
+    """Get database connection - Turso cloud or local SQLite
+    
+    The connection comes from the pool (see ConnectionPool); callers still
+    close() it when done, which returns it. Inside a Flask request every call
+    gets the request's one connection.
+    """
+    ensure_db()
+    conn = getattr(_request_scope, 'conn', None)
+    if conn is not None:
+        return conn
+    conn = _pool.acquire()
+    if getattr(_request_scope, 'active', False):
+        conn.scoped = True
+        _request_scope.conn = conn
+    return conn
+
+def begin_request():
+    """Hold one pooled connection for the rest of this request (taken on first use)"""
+    _request_scope.active = True
+
+def end_request(exc=None):
+    """Return the request's connection to the pool"""
+    conn = getattr(_request_scope, 'conn', None)
+    _request_scope.active = False
+    _request_scope.conn = None
+    if conn is not None:
+        conn.scoped = False
+        conn.close()
+
+def pool_stats():
+    """Connection pool counters, including how often and how long callers waited"""
+    return _pool.stats()
+
+def _connect():
+    """Open a new connection without touching the schema"""
     if TURSO_DATABASE_URL and TURSO_AUTH_TOKEN and USING_LIBSQL:
         # Remote-only connection to Turso (no local replica)
         conn = libsql.connect(
@@ -41,6 +249,9 @@ def get_db():
         else:
             # timeout=30 allows waiting up to 30s if another process holds the lock
             conn = libsql.connect(LOCAL_DATABASE_FILE, timeout=30)
+        
+        for name, value in sqlite_pragmas().items():
+            conn.execute(f'PRAGMA {name} = {value}')
     
     # Enable row factory for dict-like access
     if hasattr(conn, 'row_factory'):
@@ -48,9 +259,58 @@ def get_db():
     
     return conn
 
+def sqlite_pragmas(profile=None, overrides=None):
+    """PRAGMA name -> value for a profile (SQLITE_PROFILE) with SQLITE_PRAGMAS overrides applied"""
+    profile = profile or SQLITE_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}, expected one of {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    
+    overrides = SQLITE_PRAGMAS if overrides is None else overrides
+    for item in overrides.split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition('=')
+        name, value = name.strip().lower(), value.strip()
+        # Interpolated into the PRAGMA statement, so only plain names and words/numbers
+        if name not in SQLITE_PROFILES['tuned'] or not value.lstrip('-').isalnum():
+            raise ValueError(f"Unsupported SQLITE_PRAGMAS entry {item.strip()!r}")
+        pragmas[name] = value
+    return pragmas
+
+_pool = ConnectionPool(_connect)
+_request_scope = threading.local()
+
+def _after_fork():
+    """Fresh locks in a forked child: a thread holding one at fork() doesn't exist there"""
+    global _db_lock
+    _db_lock = threading.Lock()
+    _pool._lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def ensure_db():
+    """Initialize the database once per process (with retry for concurrent worker startup)"""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if _db_ready:
+            return
+        for attempt in range(5):
+            try:
+                init_db()
+                break
+            except Exception as e:
+                if 'locked' in str(e).lower() and attempt < 4:
+                    time.sleep(1 + attempt)  # backoff: 1s, 2s, 3s, 4s
+                else:
+                    raise
+        _db_ready = True
+
 def init_db():
     """Initialize database tables"""
-    conn = get_db()
+    conn = _connect()
     cursor = conn.cursor()
     
     # Holdings table
@@ -58,6 +318,7 @@ def init_db():
         CREATE TABLE IF NOT EXISTS holdings (
             id TEXT PRIMARY KEY,
             weight REAL NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
             purchase_price REAL NOT NULL,
             purchase_date TEXT NOT NULL,
             notes TEXT DEFAULT '',
@@ -72,12 +333,17 @@ def init_db():
             type TEXT NOT NULL,
             holding_id TEXT NOT NULL,
             weight REAL NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
             price REAL NOT NULL,
             date TEXT NOT NULL,
             timestamp TEXT NOT NULL
         )
     ''')
     
+    # Databases from before lots: every existing row is a single bar
+    _add_column(cursor, 'holdings', 'quantity', 'INTEGER NOT NULL DEFAULT 1')
+    _add_column(cursor, 'transactions', 'quantity', 'INTEGER NOT NULL DEFAULT 1')
+    
     # Price history table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS price_history (
@@ -96,10 +362,77 @@ def init_db():
         ON price_history(timestamp DESC)
     ''')
     
+    # Per-weight history lookups (/api/price-history?weight=)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_price_history_weight_timestamp
+        ON price_history(weight, timestamp)
+    ''')
+    
+    # Latest recorded price of each weight, so change detection never scans price_history
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latest_price (
+            weight REAL PRIMARY KEY,
+            sell_price REAL NOT NULL,
+            buy_price REAL NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    
+    # Databases from before latest_price existed: seed it once from the history
+    cursor.execute('SELECT 1 FROM latest_price LIMIT 1')
+    if cursor.fetchone() is None:
+        cursor.execute('''
+            INSERT INTO latest_price (weight, sell_price, buy_price, timestamp)
+            SELECT weight, sell_price, buy_price, timestamp FROM price_history
+            WHERE id IN (SELECT MAX(id) FROM price_history GROUP BY weight)
+        ''')
+    
+    # Full price snapshots (every vendor and weight) written by the scheduler
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fetched_at TEXT NOT NULL,
+            data TEXT NOT NULL,
+            carried_over TEXT NOT NULL DEFAULT '[]'
+        )
+    ''')
+    # Vendors a streamed scrape didn't reach, whose tables were copied from an earlier read
+    _add_column(cursor, 'price_snapshots', 'carried_over', "TEXT NOT NULL DEFAULT '[]'")
+    
+    # Successful ingestion polls, so missed hours can be found after downtime
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            ran_at TEXT PRIMARY KEY
+        )
+    ''')
+    
+    # Missed hours already dealt with: 'backfilled' from the archive or 'missing'
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_gaps (
+            hour TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            recorded_at TEXT NOT NULL
+        )
+    ''')
+    
+    # Leases (e.g. the single active ingestion worker), held until expires_at (epoch seconds)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
     
     conn.commit()
     conn.close()
 
+def _add_column(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
 def _row_to_dict(row, columns):
     """Convert a database row to dictionary"""
     if row is None:
@@ -114,13 +447,13 @@ def load_portfolio():
     cursor = conn.cursor()
     
     # Get holdings
-    cursor.execute('SELECT id, weight, purchase_price, purchase_date, notes, created_at FROM holdings ORDER BY purchase_date DESC')
-    holdings_cols = ['id', 'weight', 'purchase_price', 'purchase_date', 'notes', 'created_at']
+    cursor.execute('SELECT id, weight, quantity, purchase_price, purchase_date, notes, created_at FROM holdings ORDER BY purchase_date DESC')
+    holdings_cols = ['id', 'weight', 'quantity', 'purchase_price', 'purchase_date', 'notes', 'created_at']
     holdings = [_row_to_dict(row, holdings_cols) for row in cursor.fetchall()]
     
     # Get transactions
-    cursor.execute('SELECT id, type, holding_id, weight, price, date, timestamp FROM transactions ORDER BY id DESC')
-    tx_cols = ['id', 'type', 'holding_id', 'weight', 'price', 'date', 'timestamp']
+    cursor.execute('SELECT id, type, holding_id, weight, quantity, price, date, timestamp FROM transactions ORDER BY id DESC')
+    tx_cols = ['id', 'type', 'holding_id', 'weight', 'quantity', 'price', 'date', 'timestamp']
     transactions = [_row_to_dict(row, tx_cols) for row in cursor.fetchall()]
     
     conn.close()
@@ -132,9 +465,9 @@ def save_holding(holding):
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT OR REPLACE INTO holdings (id, weight, purchase_price, purchase_date, notes, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (holding['id'], holding['weight'], holding['purchase_price'], 
+        INSERT OR REPLACE INTO holdings (id, weight, quantity, purchase_price, purchase_date, notes, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (holding['id'], holding['weight'], holding.get('quantity', 1), holding['purchase_price'], 
           holding['purchase_date'], holding.get('notes', ''), holding['created_at']))
     
     conn.commit()
@@ -146,14 +479,51 @@ def save_transaction(transaction):
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO transactions (type, holding_id, weight, price, date, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (transaction['type'], transaction['holding_id'], transaction['weight'], 
+        INSERT INTO transactions (type, holding_id, weight, quantity, price, date, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (transaction['type'], transaction['holding_id'], transaction['weight'], transaction.get('quantity', 1),
           transaction['price'], transaction['date'], transaction['timestamp']))
     
     conn.commit()
     conn.close()
 
+def bulk_import_holdings(holdings):
+    """Insert holdings and their BUY transactions in one transaction
+    
+    Either every holding is imported or, on any error, none is. Returns
+    {"rows", "seconds", "rows_per_sec"}.
+    """
+    start = time.perf_counter()
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany('''
+            INSERT OR REPLACE INTO holdings (id, weight, quantity, purchase_price, purchase_date, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(h['id'], h['weight'], h.get('quantity', 1), h['purchase_price'], h['purchase_date'],
+               h.get('notes', ''), h['created_at'])
+              for h in holdings])
+        cursor.executemany('''
+            INSERT INTO transactions (type, holding_id, weight, quantity, price, date, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [('BUY', h['id'], h['weight'], h.get('quantity', 1), h['purchase_price'], h['purchase_date'],
+               h['created_at'])
+              for h in holdings])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    seconds = time.perf_counter() - start
+    return {
+        "rows": len(holdings),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(len(holdings) / seconds, 1) if seconds > 0 else None
+    }
+
 def update_holding(holding_id, updates):
     """Update a holding in database"""
     conn = get_db()
@@ -165,64 +535,76 @@ def update_holding(holding_id, updates):
     cursor.execute(f'UPDATE holdings SET {set_clause} WHERE id = ?', values)
     
     # Get updated holding
-    cursor.execute('SELECT id, weight, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
+    cursor.execute('SELECT id, weight, quantity, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
     row = cursor.fetchone()
     
     conn.commit()
     conn.close()
     
     if row:
-        return _row_to_dict(row, ['id', 'weight', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
+        return _row_to_dict(row, ['id', 'weight', 'quantity', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
     return None
 
-def delete_holding(holding_id, record_transaction=True, sell_price=0):
-    """Delete a holding from database"""
+def delete_holding(holding_id, record_transaction=True, sell_price=0, quantity=None):
+    """Delete a holding from database, or only quantity of its bars
+    
+    sell_price is per bar. Selling fewer bars than the lot holds keeps the
+    lot with the rest; otherwise the holding is removed. Returns the holding
+    as it was, with "sold_quantity" added. Raises ValueError for a quantity
+    below 1.
+    """
+    if quantity is not None and quantity < 1:
+        raise ValueError("quantity must be at least 1")
+    
     conn = get_db()
     cursor = conn.cursor()
     
     # Get holding first
-    cursor.execute('SELECT id, weight, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
+    cursor.execute('SELECT id, weight, quantity, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
     row = cursor.fetchone()
     
     if not row:
         conn.close()
         return None
     
-    holding = _row_to_dict(row, ['id', 'weight', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
+    holding = _row_to_dict(row, ['id', 'weight', 'quantity', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
+    sold = holding['quantity'] if quantity is None else min(quantity, holding['quantity'])
     
-    # Delete holding
-    cursor.execute('DELETE FROM holdings WHERE id = ?', (holding_id,))
+    if sold < holding['quantity']:
+        cursor.execute('UPDATE holdings SET quantity = quantity - ? WHERE id = ?', (sold, holding_id))
+    else:
+        cursor.execute('DELETE FROM holdings WHERE id = ?', (holding_id,))
     
     # Record transaction if needed
     if record_transaction:
         tz = ZoneInfo("Asia/Jakarta")
         cursor.execute('''
-            INSERT INTO transactions (type, holding_id, weight, price, date, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ('SELL' if sell_price > 0 else 'DELETE', holding_id, holding['weight'], 
+            INSERT INTO transactions (type, holding_id, weight, quantity, price, date, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('SELL' if sell_price > 0 else 'DELETE', holding_id, holding['weight'], sold,
               sell_price, datetime.now(tz).strftime('%Y-%m-%d'), datetime.now(tz).isoformat()))
     
     conn.commit()
     conn.close()
     
-    return holding
+    return {**holding, "sold_quantity": sold}
 
 def get_holding(holding_id):
     """Get a single holding by ID"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT id, weight, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
+    cursor.execute('SELECT id, weight, quantity, purchase_price, purchase_date, notes, created_at FROM holdings WHERE id = ?', (holding_id,))
     row = cursor.fetchone()
     conn.close()
     if row:
-        return _row_to_dict(row, ['id', 'weight', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
+        return _row_to_dict(row, ['id', 'weight', 'quantity', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
     return None
 
 def export_to_csv():
     """Export all holdings to CSV format"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT id, weight, purchase_price, purchase_date, notes, created_at FROM holdings ORDER BY purchase_date')
+    cursor.execute('SELECT id, weight, quantity, purchase_price, purchase_date, notes, created_at FROM holdings ORDER BY purchase_date')
     holdings = cursor.fetchall()
     conn.close()
     
@@ -237,39 +619,56 @@ def export_to_csv():
     
     # Data rows
     for h in holdings:
-        row = _row_to_dict(h, ['id', 'weight', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
-        writer.writerow([row['purchase_date'], row['weight'], 1, row['purchase_price'], row['notes']])
+        row = _row_to_dict(h, ['id', 'weight', 'quantity', 'purchase_price', 'purchase_date', 'notes', 'created_at'])
+        writer.writerow([row['purchase_date'], row['weight'], row['quantity'], row['purchase_price'], row['notes']])
     
     return output.getvalue()
 
 def save_price_history(weight, sell_price, buy_price):
-    """Save price to history if it changed from the last recorded price"""
+    """Save price to history if it changed from the last recorded price of that weight"""
+    return bool(save_price_history_batch([(weight, sell_price, buy_price)]))
+
+def save_price_history_batch(rows):
+    """Save (weight, sell_price, buy_price) rows of one scrape in a single transaction
+    
+    A row is skipped when it matches its weight's row in latest_price (one
+    row per weight, so the read stays the same size however long the
+    history grows). On local SQLite the read happens inside the write
+    transaction (BEGIN IMMEDIATE), so a price written meanwhile by another
+    process is never compared stale. libsql/Turso opens its transaction only
+    at the first write, so there it relies on the ingestion lease keeping a
+    single writer. Returns the rows that were recorded.
+    """
     conn = get_db()
     cursor = conn.cursor()
     
-    # Check if this exact price already exists (most recent entry)
-    cursor.execute('''
-        SELECT id FROM price_history 
-        WHERE weight = ? AND sell_price = ? AND buy_price = ?
-        ORDER BY timestamp DESC LIMIT 1
-    ''', (weight, sell_price, buy_price))
-    
-    if cursor.fetchone():
+    try:
+        if not USING_LIBSQL:
+            # Take the write lock before reading, so no other writer slips in between
+            cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT weight, sell_price, buy_price FROM latest_price')
+        latest = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        changed = [(weight, sell, buy) for weight, sell, buy in rows if latest.get(weight) != (sell, buy)]
+        
+        if changed:
+            timestamp = datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
+            values = [(weight, sell, buy, timestamp) for weight, sell, buy in changed]
+            cursor.executemany('''
+                INSERT INTO price_history (weight, sell_price, buy_price, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', values)
+            cursor.executemany('''
+                INSERT OR REPLACE INTO latest_price (weight, sell_price, buy_price, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', values)
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
-        return False  # Price unchanged, don't save duplicate
-    
-    # Save new price
-    tz = ZoneInfo("Asia/Jakarta")
-    timestamp = datetime.now(tz).isoformat()
-    
-    cursor.execute('''
-        INSERT INTO price_history (weight, sell_price, buy_price, timestamp)
-        VALUES (?, ?, ?, ?)
-    ''', (weight, sell_price, buy_price, timestamp))
-    
-    conn.commit()
-    conn.close()
-    return True  # New price recorded
+    return changed
 
 def get_price_history(weight=1.0, days=30):
     """Get price history for a specific weight (default 1 gram, last N days)"""
@@ -294,6 +693,199 @@ def get_price_history(weight=1.0, days=30):
     return [_row_to_dict(row, ['weight', 'sell_price', 'buy_price', 'timestamp']) 
             for row in rows]
 
+def get_price_change_hours(days=28, weight=1.0):
+    """Number of recorded price changes per hour of day (Asia/Jakarta) over the last N days"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    from datetime import timedelta
+    tz = ZoneInfo("Asia/Jakarta")
+    threshold = (datetime.now(tz) - timedelta(days=days)).isoformat()
+    
+    # Timestamps are stored as Jakarta-local ISO strings, so the hour is characters 12-13
+    cursor.execute('''
+        SELECT CAST(substr(timestamp, 12, 2) AS INTEGER) AS hour, COUNT(*)
+        FROM price_history
+        WHERE weight = ? AND timestamp >= ?
+        GROUP BY hour
+    ''', (weight, threshold))
+    
+    counts = [0] * 24
+    for hour, count in cursor.fetchall():
+        counts[hour] = count
+    conn.close()
+    return counts
+
+def save_price_snapshot(vendors, fetched_at, carried_over=()):
+    """Save the full price table of every vendor; returns the snapshot id
+    
+    carried_over names the vendors whose tables were copied from an earlier
+    read rather than fetched now. If the prices match the latest snapshot
+    only its fetched_at is bumped, so the snapshot id changes exactly when
+    prices do.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    data = json.dumps(vendors, sort_keys=True)
+    carried = json.dumps(sorted(carried_over))
+    
+    cursor.execute('SELECT id, data, carried_over FROM price_snapshots ORDER BY id DESC LIMIT 1')
+    latest = cursor.fetchone()
+    
+    if latest and latest[1] == data and latest[2] == carried:
+        snapshot_id = latest[0]
+        cursor.execute('UPDATE price_snapshots SET fetched_at = ? WHERE id = ?', (fetched_at, snapshot_id))
+    else:
+        cursor.execute('''
+            INSERT INTO price_snapshots (fetched_at, data, carried_over)
+            VALUES (?, ?, ?)
+        ''', (fetched_at, data, carried))
+        snapshot_id = cursor.lastrowid
+        cursor.execute('DELETE FROM price_snapshots WHERE id <= ?',
+                       (snapshot_id - PRICE_SNAPSHOT_RETENTION,))
+    
+    conn.commit()
+    conn.close()
+    return snapshot_id
+
+def get_latest_price_snapshot():
+    """Get the most recent price snapshot, or None if none was stored yet"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, fetched_at, data, carried_over FROM price_snapshots ORDER BY id DESC LIMIT 1')
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return None
+    snapshot = _row_to_dict(row, ['id', 'fetched_at', 'data', 'carried_over'])
+    snapshot['vendors'] = json.loads(snapshot.pop('data'))
+    snapshot['carried_over'] = json.loads(snapshot['carried_over'])
+    return snapshot
+
+def record_ingest_run(ran_at):
+    """Log a successful ingestion poll (ISO timestamp) and prune old ones"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    from datetime import timedelta
+    threshold = (datetime.fromisoformat(ran_at) - timedelta(days=INGEST_RUN_RETENTION_DAYS)).isoformat()
+    cursor.execute('INSERT OR IGNORE INTO ingest_runs (ran_at) VALUES (?)', (ran_at,))
+    cursor.execute('DELETE FROM ingest_runs WHERE ran_at < ?', (threshold,))
+    
+    conn.commit()
+    conn.close()
+
+def get_ingest_runs(since):
+    """Ingestion poll times since an ISO timestamp, oldest first"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT ran_at FROM ingest_runs WHERE ran_at >= ? ORDER BY ran_at', (since,))
+    runs = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return runs
+
+def get_known_gaps(since):
+    """Hour keys ('2024-05-01T09') from since on that were already backfilled or marked missing"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT hour FROM price_gaps WHERE hour >= ?', (since,))
+    hours = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    return hours
+
+def get_prices_before(timestamp):
+    """{weight: (sell, buy, timestamp)} as last recorded before timestamp, one index lookup per weight"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT weight FROM latest_price')
+    weights = [row[0] for row in cursor.fetchall()]
+    
+    prices = {}
+    for weight in weights:
+        cursor.execute('''
+            SELECT sell_price, buy_price, timestamp FROM price_history
+            WHERE weight = ? AND timestamp < ?
+            ORDER BY timestamp DESC LIMIT 1
+        ''', (weight, timestamp))
+        row = cursor.fetchone()
+        if row:
+            prices[weight] = (row[0], row[1], row[2])
+    conn.close()
+    return prices
+
+def get_prices_after(timestamp):
+    """{weight: (sell, buy, timestamp)} as first recorded at or after timestamp, one index lookup per weight"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT weight FROM latest_price')
+    weights = [row[0] for row in cursor.fetchall()]
+    
+    prices = {}
+    for weight in weights:
+        cursor.execute('''
+            SELECT sell_price, buy_price, timestamp FROM price_history
+            WHERE weight = ? AND timestamp >= ?
+            ORDER BY timestamp LIMIT 1
+        ''', (weight, timestamp))
+        row = cursor.fetchone()
+        if row:
+            prices[weight] = (row[0], row[1], row[2])
+    conn.close()
+    return prices
+
+def save_backfill(history, gaps):
+    """Insert backfilled (weight, sell, buy, timestamp) rows and (hour, status) gap marks in one transaction"""
+    conn = get_db()
+    cursor = conn.cursor()
+    recorded_at = datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
+    
+    try:
+        cursor.executemany('''
+            INSERT OR IGNORE INTO price_history (weight, sell_price, buy_price, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', history)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO price_gaps (hour, status, recorded_at)
+            VALUES (?, ?, ?)
+        ''', [(hour, status, recorded_at) for hour, status in gaps])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def acquire_lease(name, holder, ttl):
+    """Take or renew a lease for ttl seconds; returns True if holder now owns it
+    
+    The upsert only overwrites a lease that is ours or has expired, so of
+    several processes racing for it exactly one wins.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    now = time.time()
+    
+    cursor.execute('''
+        INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+        WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+    ''', (name, holder, now + ttl, now))
+    cursor.execute('SELECT holder FROM leases WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    
+    conn.commit()
+    conn.close()
+    return bool(row) and row[0] == holder
+
+def release_lease(name, holder):
+    """Give up a lease early so a standby can take over without waiting for expiry"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+    conn.commit()
+    conn.close()
+
 def clear_all_data():
     """Clear all data from database"""
     conn = get_db()
@@ -302,14 +894,3 @@ def clear_all_data():
     cursor.execute('DELETE FROM transactions')
     conn.commit()
     conn.close()
-
-# Initialize database on module load (with retry for concurrent worker startup)
-for _attempt in range(5):
-    try:
-        init_db()
-        break
-    except Exception as e:
-        if 'locked' in str(e).lower() and _attempt < 4:
-            time.sleep(1 + _attempt)  # backoff: 1s, 2s, 3s, 4s
-        else:
-            raise
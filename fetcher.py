@@ -0,0 +1,314 @@
+"""
+HTTP fetcher for Gold Portfolio Tracker
+Pooled keep-alive session used to scrape Galeri24.co.id
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from archive import PriceArchive, PRICE_ARCHIVE
+
+# Fetcher configuration
+FETCH_CONNECT_TIMEOUT = float(os.environ.get('FETCH_CONNECT_TIMEOUT', 5))
+FETCH_READ_TIMEOUT = float(os.environ.get('FETCH_READ_TIMEOUT', 15))
+FETCH_POOL_SIZE = int(os.environ.get('FETCH_POOL_SIZE', 4))
+FETCH_CHUNK_SIZE = int(os.environ.get('FETCH_CHUNK_SIZE', 8192))
+
+# Hedged requests: if the first request is slower than this percentile of
+# recent latencies, race a second one. The budget is the fraction of requests
+# that may be hedged (at most 1.0, so upstream load never more than doubles).
+FETCH_HEDGE = os.environ.get('FETCH_HEDGE', '').lower() in ('1', 'true', 'yes')
+FETCH_HEDGE_PERCENTILE = float(os.environ.get('FETCH_HEDGE_PERCENTILE', 95))
+FETCH_HEDGE_BUDGET = min(1.0, float(os.environ.get('FETCH_HEDGE_BUDGET', 0.1)))
+FETCH_HEDGE_MIN_DELAY = float(os.environ.get('FETCH_HEDGE_MIN_DELAY', 0.1))
+
+# Upstream site; point it at tools/fake_galeri24.py for offline testing
+GALERI24_BASE_URL = os.environ.get('GALERI24_BASE_URL', 'https://galeri24.co.id').rstrip('/')
+PRICE_PAGE_URL = f"{GALERI24_BASE_URL}/harga-emas"
+
+# Marker of the default price block whose bytes decide whether the page changed
+SECTION_MARKER = b'id="GALERI 24"'
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+def _accept_encoding():
+    """Only advertise brotli when urllib3 can actually decode it"""
+    try:
+        import brotli  # noqa: F401
+        return 'gzip, deflate, br'
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return 'gzip, deflate, br'
+        except ImportError:
+            return 'gzip, deflate'
+
+
+def section_digest(body, markers=(SECTION_MARKER,)):
+    """Hash only the price blocks so unrelated page churn doesn't count as a change"""
+    digest = hashlib.sha256()
+    for marker in markers:
+        start = body.find(marker)
+        if start == -1:
+            # Page layout changed: fall back to the whole body
+            return hashlib.sha256(body).hexdigest()
+        # A block runs until the next sibling container with an id
+        end = body.find(b'<div id="', start + len(marker))
+        digest.update(body[start:end if end != -1 else len(body)])
+    return digest.hexdigest()
+
+
+class LatencyTracker:
+    """Rolling window of recent upstream response times"""
+
+    def __init__(self, size=100, min_samples=10):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """Latency at pct, or None until enough samples were seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+
+class HedgeBudget:
+    """Token bucket: every request earns ratio tokens, every hedge spends one"""
+
+    def __init__(self, ratio=FETCH_HEDGE_BUDGET, burst=5):
+        self.ratio = ratio
+        self.burst = max(burst * ratio, 1.0)
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _discard(future):
+    """Release the connection of a hedged request that lost the race"""
+    if future.exception() is None:
+        future.result().close()
+
+
+class Galeri24Fetcher:
+    """Thread-safe fetcher sharing one pooled requests.Session per process"""
+
+    def __init__(self, connect_timeout=FETCH_CONNECT_TIMEOUT, read_timeout=FETCH_READ_TIMEOUT,
+                 pool_size=FETCH_POOL_SIZE, archive=None, hedge=FETCH_HEDGE,
+                 hedge_percentile=FETCH_HEDGE_PERCENTILE, hedge_budget=FETCH_HEDGE_BUDGET):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.archive = archive  # PriceArchive capturing every full page downloaded
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget(hedge_budget)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+        self._pid = None
+        self._validators = {}  # url -> {"etag", "last_modified", "digest"}
+
+    @property
+    def session(self):
+        """Pooled session, recreated after a fork so workers never share sockets"""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._build_session()
+                self._executor = None
+                self._pid = os.getpid()
+            return self._session
+
+    @property
+    def executor(self):
+        """Threads racing hedged requests, created on first use in each process"""
+        self.session  # drops a pre-fork executor along with the session
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='fetch')
+            return self._executor
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Encoding': _accept_encoding(),
+            'Connection': 'keep-alive'
+        })
+        # Retry only connection setup; a slow read is not worth doubling
+        retries = Retry(total=1, connect=1, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(
+            pool_connections=1,  # a single upstream host
+            pool_maxsize=self.pool_size,
+            max_retries=retries
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_if_changed(self, url, markers=(SECTION_MARKER,), **kwargs):
+        """Conditional GET; returns None when the page is unchanged since the last call
+
+        Sends If-None-Match/If-Modified-Since from the previous response and,
+        when the server ignores them, compares a hash of the sections that
+        start at each of the given markers.
+        """
+        previous, headers = self._conditional_headers(url, kwargs.pop('headers', None))
+        kwargs.setdefault('timeout', self.timeout)
+        response = self._send(url, headers=headers, **kwargs)
+        if response.status_code == 304 and previous:
+            return None
+        response.raise_for_status()
+        self._capture(url, response)
+
+        digest = section_digest(response.content, markers)
+        self._remember(url, response, digest)
+        if digest == previous.get('digest'):
+            return None
+        return response
+
+    def stream_if_changed(self, url, parser, chunk_size=FETCH_CHUNK_SIZE, **kwargs):
+        """Conditional GET streamed into an incremental parser
+
+        Chunks are fed to parser.feed() until parser.done, then the connection
+        is dropped without reading the rest of the page. Returns None on a 304,
+        otherwise the parser. There is no section hash here, since the point
+        is to avoid downloading the whole body.
+        """
+        previous, headers = self._conditional_headers(url, kwargs.pop('headers', None))
+        kwargs.setdefault('timeout', self.timeout)
+        response = self._send(url, headers=headers, stream=True, **kwargs)
+        try:
+            if response.status_code == 304 and previous:
+                return None
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                parser.feed(chunk)
+                if parser.done:
+                    break
+            else:
+                parser.close()
+        finally:
+            # Closing a partly read response discards the connection instead of draining it
+            response.close()
+
+        self._remember(url, response, None)
+        return parser
+
+    def _timed_get(self, url, kwargs):
+        start = time.monotonic()
+        response = self.session.get(url, **kwargs)
+        self.latency.record(time.monotonic() - start)
+        return response
+
+    def _send(self, url, **kwargs):
+        """session.get, hedged with a second request when the first is slow"""
+        if not self.hedge:
+            return self._timed_get(url, kwargs)
+
+        self.budget.earn()
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None:
+            return self._timed_get(url, kwargs)
+
+        delay = max(delay, FETCH_HEDGE_MIN_DELAY)
+        primary = self.executor.submit(self._timed_get, url, kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except TimeoutError:
+            pass
+        if not self.budget.spend():
+            return primary.result()
+
+        with self._lock:
+            self.hedges_sent += 1
+        hedge = self.executor.submit(self._timed_get, url, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(_discard)
+                    with self._lock:
+                        if future is hedge:
+                            self.hedges_won += 1
+                        won, sent = self.hedges_won, self.hedges_sent
+                    print(f"🏁 Hedged a request slower than {delay:.2f}s, {'hedge' if future is hedge else 'original'} "
+                          f"answered first ({won}/{sent} hedges won)")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _capture(self, url, response):
+        if self.archive is None:
+            return
+        try:
+            self.archive.save(response.content, url)
+        except Exception as e:
+            print(f"❌ Page archive error: {e}")
+
+    def _conditional_headers(self, url, headers=None):
+        with self._lock:
+            previous = self._validators.get(url, {})
+
+        headers = dict(headers or {})
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+        return previous, headers
+
+    def _remember(self, url, response, digest):
+        with self._lock:
+            self._validators[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'digest': digest
+            }
+
+    def forget(self, url):
+        """Drop stored validators so the next conditional GET downloads in full"""
+        with self._lock:
+            self._validators.pop(url, None)
+
+    def close(self):
+        """Close pooled connections"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Shared fetcher for the whole process
+fetcher = Galeri24Fetcher(archive=PriceArchive() if PRICE_ARCHIVE else None)
@@ -0,0 +1,268 @@
+"""
+Price ingestion worker for Gold Portfolio Tracker
+Owns every galeri24 scrape and price write. Web workers only read what this
+process stores, and a lease in the database keeps a single instance active.
+
+Usage:
+    python ingest.py              # run the scheduler (Procfile: worker)
+    python ingest.py --once       # record one tick and exit
+    python ingest.py --backfill   # fill missed hours from the archive and exit
+"""
+
+import argparse
+import atexit
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import database as db
+from backfill import backfill_gaps
+from fetcher import fetcher, PRICE_PAGE_URL
+from parsers import ParseExecutor, StreamingPriceParser, VENDOR_ID
+from price_cache import SingleFlight
+from circuit_breaker import CircuitBreaker
+from cadence import AdaptiveCadence, AdaptiveTrigger
+from apscheduler.schedulers.background import BackgroundScheduler
+
+# Lease configuration: a worker that stops renewing is replaced after INGEST_LEASE_TTL seconds
+INGEST_LEASE_NAME = 'price_ingest'
+INGEST_LEASE_TTL = float(os.environ.get('INGEST_LEASE_TTL', 60))
+
+# 'full' downloads the whole page; 'stream' stops reading once the price table closes
+PRICE_SCRAPE_MODE = os.environ.get('PRICE_SCRAPE_MODE', 'full')
+# Vendors the streaming scrape waits for before hanging up (vendors listed before them come free).
+# Vendors it never reaches keep their tables from the last read that did, marked as carried over.
+PRICE_STREAM_VENDORS = [v.strip() for v in os.environ.get('PRICE_STREAM_VENDORS', VENDOR_ID).split(',') if v.strip()]
+
+# Overlapping callers (scheduled job, manual --once run) share one scrape
+_price_flight = SingleFlight()
+
+# Full-page parses run here (see PRICE_PARSE_EXECUTOR), off the caller's GIL if configured
+parse_executor = ParseExecutor()
+
+# Fails fast while galeri24 is down instead of tying up threads on timeouts
+_price_breaker = CircuitBreaker()
+
+# Last parsed vendor price tables, reused when the page hasn't changed, and the
+# last successful result, served stale while upstream fails. Only the
+# single-flight leader touches them, so no extra locking is needed.
+_last_vendor_prices = None
+_last_carried_over = []
+_last_good_prices = None
+
+def get_gold_prices():
+    """Fetch current gold prices from Galeri24.co.id"""
+    return _price_flight.do(_scrape_gold_prices)
+
+def _fetch_price_tables(url):
+    """Fetch and parse every vendor price table; returns (changed, tables)"""
+    if PRICE_SCRAPE_MODE == 'stream':
+        # Read the whole page until a first read has shown every vendor on it
+        wanted = PRICE_STREAM_VENDORS if _last_vendor_prices is not None else None
+        parser = fetcher.stream_if_changed(url, StreamingPriceParser(wanted))
+        if parser is None:
+            return False, None
+        return True, parser.results()
+    
+    markers = [f'id="{vendor}"'.encode() for vendor in (_last_vendor_prices or [VENDOR_ID])]
+    response = fetcher.get_if_changed(url, markers=markers)
+    if response is None:
+        return False, None
+    return True, parse_executor.parse(response.text)
+
+def _stale_gold_prices(error):
+    """Last good price table flagged as stale, or the error if there is none"""
+    if _last_good_prices is None:
+        return {
+            "success": False,
+            "error": error
+        }
+    return {**_last_good_prices, "stale": True, "error": error}
+
+def _scrape_gold_prices():
+    """Scrape and parse the Galeri24 price tables of every vendor"""
+    global _last_vendor_prices, _last_carried_over, _last_good_prices
+    url = PRICE_PAGE_URL
+    
+    if not _price_breaker.allow():
+        return _stale_gold_prices(f"Upstream unavailable, retrying in {_price_breaker.retry_in():.0f}s")
+    
+    try:
+        changed, vendor_prices = _fetch_price_tables(url)
+        _price_breaker.record_success()
+        
+        if not changed and _last_vendor_prices is not None:
+            # 304 or identical price sections: skip the parse
+            vendor_prices = _last_vendor_prices
+        else:
+            if not changed:
+                fetcher.forget(url)
+                changed, vendor_prices = _fetch_price_tables(url)
+            if VENDOR_ID not in vendor_prices:
+                # Don't let a later 304 vouch for a page we couldn't parse
+                fetcher.forget(url)
+                _last_vendor_prices = None
+                return None
+            # A streamed read stops early; keep the vendors it didn't get to
+            carried = {vendor: table for vendor, table in (_last_vendor_prices or {}).items()
+                       if vendor not in vendor_prices} if PRICE_SCRAPE_MODE == 'stream' else {}
+            _last_carried_over = sorted(carried)
+            _last_vendor_prices = vendor_prices = {**vendor_prices, **carried}
+        
+        tz = ZoneInfo("Asia/Jakarta")
+        last_update = datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')
+        
+        _last_good_prices = {
+            "success": True,
+            "last_update": last_update,
+            "timezone": "Asia/Jakarta (GMT+7)",
+            "data": vendor_prices[VENDOR_ID],
+            "vendors": vendor_prices,
+            "carried_over": _last_carried_over
+        }
+        return _last_good_prices
+        
+    except Exception as e:
+        fetcher.forget(url)
+        _price_breaker.record_failure()
+        return _stale_gold_prices(str(e))
+
+def record_price_snapshot():
+    """Scrape prices and store them as the latest price snapshot"""
+    prices = get_gold_prices()
+    if prices and prices.get("success") and not prices.get("stale"):
+        vendors = {vendor: table.to_dict() for vendor, table in prices["vendors"].items()}
+        snapshot_id = db.save_price_snapshot(vendors, prices["last_update"], prices["carried_over"])
+        prices = {**prices, "snapshot_id": snapshot_id}
+    return prices
+
+
+# When to scrape, learned from when the 1 gram price has changed before
+cadence = AdaptiveCadence(db.get_price_change_hours)
+
+def record_price_tick():
+    """Background job: Snapshot all prices and record every GALERI 24 weight whose price changed"""
+    cadence.record()
+    try:
+        prices = record_price_snapshot()
+        if prices and prices.get("success"):
+            table = prices["data"]
+            changed = db.save_price_history_batch([
+                (weight, float(sell), float(buy))
+                for weight, sell, buy in zip(table.weights, table.sell, table.buy)
+            ])
+            now = datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H:%M:%S')
+            one_gram = next((row for row in changed if row[0] == 1.0), None)
+            if one_gram:
+                print(f"✅ Price updated at {now}: Sell={one_gram[1]}, Buy={one_gram[2]} ({len(changed)} weight(s) changed)")
+            elif changed:
+                print(f"✅ Price updated at {now}: {len(changed)} weight(s) changed")
+            else:
+                print(f"ℹ️  Price unchanged at {now}")
+            if not prices.get("stale"):
+                db.record_ingest_run(datetime.now(ZoneInfo('Asia/Jakarta')).isoformat())
+    except Exception as e:
+        print(f"❌ Price recording error: {e}")
+
+def backfill_missed_hours():
+    """Background job: fill hours missed while no worker was polling"""
+    try:
+        backfill_gaps()
+    except Exception as e:
+        print(f"❌ Backfill error: {e}")
+
+def start_scheduler():
+    """Scheduler with the price and backfill jobs, both of which also run right away"""
+    scheduler = BackgroundScheduler(
+        timezone="Asia/Jakarta",
+        # A late or suspended worker runs a missed job once, not once per missed run
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 3600}
+    )
+    # Every few minutes in hours when prices tend to move, up to every 2 hours when they don't
+    scheduler.add_job(
+        func=record_price_tick,
+        trigger=AdaptiveTrigger(cadence),
+        id="price_check",
+        replace_existing=True
+    )
+    # Downtime is caught up in one batch from the archive, after the first tick
+    # has logged a run to close the latest gap with
+    scheduler.add_job(
+        func=backfill_missed_hours,
+        trigger="interval",
+        hours=6,
+        id="backfill",
+        replace_existing=True,
+        next_run_time=datetime.now(ZoneInfo("Asia/Jakarta")) + timedelta(minutes=1)
+    )
+    scheduler.start()
+    return scheduler
+
+def default_holder():
+    """Lease holder id of this process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run(holder):
+    """Hold the ingestion lease and run the scheduler while we have it"""
+    scheduler = None
+    standing_by = False
+    try:
+        while True:
+            try:
+                leased = db.acquire_lease(INGEST_LEASE_NAME, holder, INGEST_LEASE_TTL)
+            except Exception as e:
+                # Can't prove we still own it, so don't risk two active workers
+                print(f"❌ Lease renewal error: {e}")
+                leased = False
+            
+            if leased and scheduler is None:
+                print(f"🔒 Ingestion lease acquired by {holder}")
+                scheduler = start_scheduler()
+            elif not leased and scheduler is not None:
+                print(f"⚠️  Ingestion lease lost by {holder}, pausing")
+                scheduler.shutdown(wait=False)
+                scheduler = None
+            elif not leased and not standing_by:
+                print("⏳ Another worker holds the ingestion lease, standing by")
+            standing_by = not leased
+            time.sleep(INGEST_LEASE_TTL / 3)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown()
+            db.release_lease(INGEST_LEASE_NAME, holder)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='record one price tick and exit')
+    parser.add_argument('--backfill', action='store_true', help='fill missed hours from the archive and exit')
+    args = parser.parse_args()
+    
+    atexit.register(fetcher.close)
+    atexit.register(parse_executor.shutdown)
+    
+    if args.once or args.backfill:
+        # One-off runs write too, so they need the lease like the scheduler does
+        holder = default_holder()
+        if not db.acquire_lease(INGEST_LEASE_NAME, holder, INGEST_LEASE_TTL):
+            sys.exit("⏳ Another worker holds the ingestion lease; stop it or wait for it to expire")
+        try:
+            if args.once:
+                record_price_tick()
+            else:
+                backfill_gaps()
+        finally:
+            db.release_lease(INGEST_LEASE_NAME, holder)
+        return
+    
+    # Platforms stop workers with SIGTERM; exit through the finally that releases the lease
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        run(default_holder())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
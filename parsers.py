@@ -0,0 +1,311 @@
+"""
+Price page parsers for Gold Portfolio Tracker
+Pluggable backends that extract the vendor price tables from harga-emas HTML
+"""
+
+import os
+import codecs
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from decimal import Decimal
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup, SoupStrainer
+from price_table import PriceTable
+
+# Optional fast backends
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+# Backend used by parse_gold_prices unless one is passed explicitly;
+# defaults to the fastest one installed
+PRICE_PARSER = os.environ.get('PRICE_PARSER')
+
+# Vendor served when a caller doesn't ask for one
+VENDOR_ID = "GALERI 24"
+
+# Where full-page parses run: 'inline' in the calling thread, 'thread' on one
+# dedicated thread, or 'process' in a worker process so the parse doesn't hold
+# the web worker's GIL. PRICE_PARSE_QUEUE bounds the parses waiting for it.
+PRICE_PARSE_EXECUTOR = os.environ.get('PRICE_PARSE_EXECUTOR', 'inline')
+PRICE_PARSE_QUEUE = int(os.environ.get('PRICE_PARSE_QUEUE', 4))
+CONTAINER_CLASS = "grid divide-neutral-200 border-neutral-200"
+ROW_CLASS = "grid grid-cols-5 divide-x lg:hover:bg-neutral-50 transition-all"
+WEIGHT_COL_CLASS = "p-3 col-span-1 whitespace-nowrap w-fit"
+PRICE_COL_CLASS = "p-3 col-span-2 whitespace-nowrap w-fit"
+
+
+def clean_price(price_str):
+    """Clean price string like 'Rp1.041.000' -> Decimal('1041000')"""
+    price_str = price_str.replace("Rp", "").replace(".", "").replace(",", "").strip()
+    return Decimal(price_str)
+
+
+def _build_table(rows):
+    """Turn [weight, sell, buy] text rows into a PriceTable"""
+    return PriceTable.from_rows(
+        (float(cols_text[0]), int(clean_price(cols_text[1])), int(clean_price(cols_text[2])))
+        for cols_text in rows if len(cols_text) == 3
+    )
+
+
+def _rows_from_container(main_container):
+    rows = []
+    for row in main_container.find_all("div", class_=ROW_CLASS):
+        cols = row.find_all("div", class_=WEIGHT_COL_CLASS) + \
+               row.find_all("div", class_=PRICE_COL_CLASS)
+        rows.append([col.get_text(strip=True) for col in cols])
+    return rows
+
+
+def _vendor_rows_from_soup(soup):
+    """Each price container belongs to the nearest enclosing div with an id"""
+    vendors = {}
+    for main_container in soup.find_all("div", class_=CONTAINER_CLASS):
+        vendor_div = main_container.find_parent("div", id=True)
+        if vendor_div is not None and vendor_div["id"] not in vendors:
+            vendors[vendor_div["id"]] = _rows_from_container(main_container)
+    return vendors
+
+
+def _rows_html_parser(html):
+    """Reference backend: full html.parser tree of the whole page"""
+    return _vendor_rows_from_soup(BeautifulSoup(html, "html.parser"))
+
+
+def _rows_strainer(html):
+    """html.parser, but only divs with an id (the vendor blocks) are built into a tree"""
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("div", id=True))
+    return _vendor_rows_from_soup(soup)
+
+
+def _lxml_text(element):
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _rows_lxml(html):
+    """libxml2 via lxml, matching classes the way BeautifulSoup does"""
+    tree = lxml.html.fromstring(html)
+    vendors = {}
+    for container in tree.xpath('//div[normalize-space(@class)=$cls]', cls=CONTAINER_CLASS):
+        vendor_div = container.xpath('ancestor::div[@id][1]')
+        if not vendor_div or vendor_div[0].get('id') in vendors:
+            continue
+
+        rows = []
+        for row in container.xpath('.//div[normalize-space(@class)=$cls]', cls=ROW_CLASS):
+            cols = row.xpath('.//div[normalize-space(@class)=$cls]', cls=WEIGHT_COL_CLASS) + \
+                   row.xpath('.//div[normalize-space(@class)=$cls]', cls=PRICE_COL_CLASS)
+            rows.append([_lxml_text(col) for col in cols])
+        vendors[vendor_div[0].get('id')] = rows
+    return vendors
+
+
+def _rows_selectolax(html):
+    """Lexbor via selectolax, the fastest backend when installed"""
+    tree = LexborHTMLParser(html)
+    vendors = {}
+    for container in tree.css(f'div[class="{CONTAINER_CLASS}"]'):
+        vendor_div = container.parent
+        while vendor_div is not None and not (vendor_div.tag == 'div' and 'id' in vendor_div.attributes):
+            vendor_div = vendor_div.parent
+        if vendor_div is None or vendor_div.attributes['id'] in vendors:
+            continue
+
+        rows = []
+        for row in container.css(f'div[class="{ROW_CLASS}"]'):
+            cols = row.css(f'div[class="{WEIGHT_COL_CLASS}"]') + \
+                   row.css(f'div[class="{PRICE_COL_CLASS}"]')
+            rows.append([col.text(deep=True, separator='', strip=True) for col in cols])
+        vendors[vendor_div.attributes['id']] = rows
+    return vendors
+
+
+# Backend name -> extractor of {vendor id: rows}
+BACKENDS = {
+    "html.parser": _rows_html_parser,
+    "strainer": _rows_strainer
+}
+if HAS_LXML:
+    BACKENDS["lxml"] = _rows_lxml
+if HAS_SELECTOLAX:
+    BACKENDS["selectolax"] = _rows_selectolax
+
+if PRICE_PARSER is None:
+    PRICE_PARSER = next(name for name in ("selectolax", "lxml", "strainer") if name in BACKENDS)
+elif PRICE_PARSER not in BACKENDS:
+    print(f"⚠️  Price parser '{PRICE_PARSER}' not available, using 'strainer'")
+    PRICE_PARSER = "strainer"
+
+
+def parse_vendor_prices(html, backend=None):
+    """Parse every vendor's price table out of the harga-emas page in one pass"""
+    vendors = BACKENDS[backend or PRICE_PARSER](html)
+    return {vendor: _build_table(rows) for vendor, rows in vendors.items()}
+
+
+def parse_gold_prices(html, backend=None):
+    """Parse the GALERI 24 price table out of the harga-emas page"""
+    return parse_vendor_prices(html, backend).get(VENDOR_ID)
+
+
+class ParseExecutor:
+    """Runs parse_vendor_prices inline, on a dedicated thread or in a worker process"""
+
+    def __init__(self, kind=PRICE_PARSE_EXECUTOR, queue_size=PRICE_PARSE_QUEUE):
+        if kind not in ('inline', 'thread', 'process'):
+            raise ValueError(f"Unknown parse executor: {kind}")
+        self.kind = kind
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def submit(self, html, backend=None):
+        """Queue a parse; returns a Future of the {vendor: table} dict
+
+        Blocks while queue_size parses are already waiting, so a slow
+        worker pushes back on the scraper instead of piling up pages.
+        """
+        backend = backend or PRICE_PARSER
+        if self.kind == 'inline':
+            future = Future()
+            try:
+                future.set_result(parse_vendor_prices(html, backend))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self._get_pool().submit(parse_vendor_prices, html, backend)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def parse(self, html, backend=None):
+        """Parse and wait for the result"""
+        return self.submit(html, backend).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self):
+        # Pools don't survive a fork: each gunicorn worker starts its own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                if self.kind == 'thread':
+                    self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='parse')
+                else:
+                    self._pool = ProcessPoolExecutor(max_workers=1)
+                self._pid = os.getpid()
+            return self._pool
+
+
+class StreamingPriceParser(HTMLParser):
+    """Incremental parser for the vendor price tables that knows when it is finished
+
+    Feed it raw response chunks. Every vendor block seen is collected; once
+    all the wanted vendors have closed, done is True and the rest of the
+    page can be left unread. With wanted=None the whole page is read.
+    """
+
+    def __init__(self, wanted=(VENDOR_ID,), encoding='utf-8'):
+        super().__init__(convert_charrefs=True)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.wanted = set(wanted) if wanted is not None else None
+        self.done = False
+        self._stack = []  # (id, role) of each open div; role: container/row/column/None
+        self._vendors = {}  # vendor id -> rows, in page order
+        self._finished = set()
+        self._rows = None  # rows of the open container
+        self._row = None  # [weight cols, price cols] of the open row
+        self._open_cols = []  # text buffers of the open columns
+        self._text = []
+
+    def feed(self, data):
+        if self.done:
+            return
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
+
+    def result(self, vendor=VENDOR_ID):
+        """One vendor's price table, or None if its block was not found"""
+        rows = self._vendors.get(vendor)
+        return _build_table(rows) if rows is not None else None
+
+    def results(self):
+        """Every vendor price table seen so far"""
+        return {vendor: _build_table(rows) for vendor, rows in self._vendors.items()}
+
+    def _flush_text(self):
+        # One text node ends at every tag, like a NavigableString in bs4
+        if self._text:
+            text = ''.join(self._text).strip()
+            self._text = []
+            for col in self._open_cols:
+                col.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag != 'div' or self.done:
+            return
+        attrs = dict(attrs)
+        cls = ' '.join((attrs.get('class') or '').split())
+        role = None
+        if self._rows is None and cls == CONTAINER_CLASS:
+            # The container belongs to the nearest enclosing div with an id
+            vendor = next((div_id for div_id, _ in reversed(self._stack) if div_id), None)
+            if vendor is not None and vendor not in self._vendors:
+                role = 'container'
+                self._rows = self._vendors[vendor] = []
+        elif self._rows is not None and self._row is None and cls == ROW_CLASS:
+            role = 'row'
+            self._row = [[], []]
+        elif self._row is not None and cls in (WEIGHT_COL_CLASS, PRICE_COL_CLASS):
+            role = []
+            self._row[0 if cls == WEIGHT_COL_CLASS else 1].append(role)
+            self._open_cols.append(role)
+        self._stack.append((attrs.get('id'), role))
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag != 'div' or not self._stack or self.done:
+            return
+
+        div_id, role = self._stack.pop()
+        if role == 'container':
+            self._rows = None
+        elif role == 'row':
+            weight_cols, price_cols = self._row
+            self._rows.append([''.join(col) for col in weight_cols + price_cols])
+            self._row = None
+        elif isinstance(role, list):
+            self._open_cols = [col for col in self._open_cols if col is not role]
+
+        if div_id in self._vendors:
+            self._finished.add(div_id)
+            if self.wanted is not None and self.wanted <= self._finished:
+                # Every wanted vendor block closed: nothing more to read
+                self.done = True
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_data(self, data):
+        if self._open_cols:
+            self._text.append(data)
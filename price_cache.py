@@ -0,0 +1,146 @@
+"""
+Price cache for Gold Portfolio Tracker
+Keeps the last good price table in memory and refreshes it in the background
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Seconds a price table is served as fresh before a background reload starts
+PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 300))
+
+
+class PriceCache:
+    """TTL cache with stale-while-revalidate in front of a price loader
+
+    The loader's result carries every vendor's table under "vendors"; get()
+    hands out one vendor's table as "data" plus the list of vendor names.
+    """
+
+    def __init__(self, loader, ttl=PRICE_CACHE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._prices = None
+        self._stored_at = 0.0  # time.monotonic() of the last store
+        self._cached_at = None  # wall clock of the last store, for responses
+        self._refreshing = False
+
+    def get(self, vendor=None):
+        """Return the cached price table, loading it only if none is usable yet
+
+        Raises KeyError if vendor is not on the cached page.
+        """
+        with self._lock:
+            if self._prices is not None:
+                if self._age() >= self.ttl and not self._refreshing:
+                    # Serve the stale table now and revalidate in the background
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, daemon=True).start()
+                return self._with_metadata(self._prices, vendor, self._cached_at, int(self._age()))
+
+        # Nothing cached yet (cold start or no snapshot stored yet): block once
+        prices = self.loader()
+        if self.set(prices):
+            with self._lock:
+                return self._with_metadata(self._prices, vendor, self._cached_at, int(self._age()))
+        return prices
+
+    def peek(self, vendor=None):
+        """Like get(), but returns None instead of loading when nothing is cached"""
+        with self._lock:
+            if self._prices is None:
+                return None
+        return self.get(vendor)
+
+    def set(self, prices):
+        """Store a freshly loaded price table; failed loads are ignored"""
+        if not prices or not prices.get("success"):
+            return False
+        with self._lock:
+            self._prices = prices
+            self._stored_at = time.monotonic()
+            self._cached_at = datetime.now(ZoneInfo("Asia/Jakarta")).strftime('%Y-%m-%d %H:%M:%S')
+        return True
+
+    def _refresh(self):
+        """Background job: reload prices, keeping the stale table on failure"""
+        try:
+            self.set(self.loader())
+        except Exception as e:
+            print(f"❌ Price cache refresh error: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _age(self):
+        return time.monotonic() - self._stored_at
+
+    def _with_metadata(self, prices, vendor, cached_at, age):
+        vendors = prices.get("vendors") or {}
+        prices = {
+            **prices,
+            "vendors": list(vendors),
+            "cached_at": cached_at,
+            "age": age
+        }
+        if vendor:
+            name = self._vendor_name(vendors, vendor)
+            prices["vendor"] = name
+            prices["data"] = vendors[name]
+        return prices
+
+    @staticmethod
+    def _vendor_name(vendors, vendor):
+        """Match ?vendor= case-insensitively against the vendor ids on the page"""
+        if vendor in vendors:
+            return vendor
+        for name in vendors:
+            if name.lower() == vendor.strip().lower():
+                return name
+        raise KeyError(vendor)
+
+
+class _Call:
+    """A single in-flight call shared by every waiter"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls so only one runs and every caller gets its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._call = None
+
+    def do(self, fn):
+        """Run fn, or wait for the call already in flight and share its result"""
+        with self._lock:
+            call = self._call
+            leader = call is None
+            if leader:
+                call = self._call = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._call = None
+            call.done.set()
+        return call.result
@@ -0,0 +1,115 @@
+"""
+Price table model for Gold Portfolio Tracker
+Compact per-vendor price list: sorted weights with integer rupiah prices
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+class PriceTable:
+    """One vendor's prices as parallel arrays sorted by weight
+
+    Prices are whole rupiah. Any weight, listed or not, is valued off
+    curve(). to_dict() is the single place the
+    {"1.0": {"weight", "sell", "buy", "spread_pct"}} JSON shape is built,
+    and it is built once per table.
+    """
+
+    __slots__ = ('weights', 'sell', 'buy', '_dict', '_curve')
+
+    def __init__(self, weights=(), sell=(), buy=()):
+        self.weights = array('d', weights)
+        self.sell = array('q', sell)
+        self.buy = array('q', buy)
+        self._dict = None
+        self._curve = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (weight, sell, buy) rows in any order; a repeated weight keeps its last row"""
+        by_weight = {}
+        for weight, sell, buy in rows:
+            by_weight[float(weight)] = (int(sell), int(buy))
+        weights = sorted(by_weight)
+        return cls(weights, [by_weight[w][0] for w in weights], [by_weight[w][1] for w in weights])
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from the JSON shape produced by to_dict()"""
+        return cls.from_rows((row["weight"], row["sell"], row["buy"]) for row in data.values())
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __eq__(self, other):
+        if not isinstance(other, PriceTable):
+            return NotImplemented
+        return self.weights == other.weights and self.sell == other.sell and self.buy == other.buy
+
+    def __getstate__(self):
+        return (self.weights, self.sell, self.buy)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def curve(self):
+        """Per-gram price curve across the listed denominations, built once per table"""
+        if self._curve is None:
+            self._curve = PriceCurve(self)
+        return self._curve
+
+    def to_dict(self):
+        """The API/snapshot JSON shape, keyed by str(weight); built once and shared, don't mutate"""
+        if self._dict is None:
+            data = {}
+            for weight, sell, buy in zip(self.weights, self.sell, self.buy):
+                spread_pct = ((sell - buy) / buy * 100) if buy else 0
+                data[str(weight)] = {
+                    "weight": weight,
+                    "sell": float(sell),
+                    "buy": float(buy),
+                    "spread_pct": round(spread_pct, 2)
+                }
+            self._dict = data
+        return self._dict
+
+
+class PriceCurve:
+    """Piecewise-linear per-gram price against weight
+
+    Small bars cost more per gram than large ones, so an unlisted weight is
+    valued at the per-gram price interpolated between the neighbouring
+    listed denominations (found by binary search) rather than at the 1 g
+    price. Listed weights come out at exactly their listed price; weights
+    outside the listed range use the nearest end's per-gram price.
+    """
+
+    __slots__ = ('weights', 'sell_per_gram', 'buy_per_gram')
+
+    def __init__(self, table):
+        self.weights = table.weights
+        self.sell_per_gram = array('d', (sell / weight for sell, weight in zip(table.sell, table.weights)))
+        self.buy_per_gram = array('d', (buy / weight for buy, weight in zip(table.buy, table.weights)))
+
+    def per_gram(self, weight):
+        """(sell, buy) per gram at weight"""
+        weights = self.weights
+        if not weights:
+            return 0.0, 0.0
+        i = bisect_left(weights, weight)
+        if i < len(weights) and weights[i] == weight:
+            return self.sell_per_gram[i], self.buy_per_gram[i]
+        if i == 0:
+            return self.sell_per_gram[0], self.buy_per_gram[0]
+        if i == len(weights):
+            return self.sell_per_gram[-1], self.buy_per_gram[-1]
+
+        t = (weight - weights[i - 1]) / (weights[i] - weights[i - 1])
+        return (self.sell_per_gram[i - 1] + t * (self.sell_per_gram[i] - self.sell_per_gram[i - 1]),
+                self.buy_per_gram[i - 1] + t * (self.buy_per_gram[i] - self.buy_per_gram[i - 1]))
+
+    def value(self, weight):
+        """(sell, buy) total for a bar of this weight"""
+        sell, buy = self.per_gram(weight)
+        return sell * weight, buy * weight
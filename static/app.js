@@ -23,6 +23,7 @@ const elements = {
     holdingForm: document.getElementById('holdingForm'),
     holdingId: document.getElementById('holdingId'),
     weight: document.getElementById('weight'),
+    quantity: document.getElementById('quantity'),
     purchasePrice: document.getElementById('purchasePrice'),
     purchaseDate: document.getElementById('purchaseDate'),
     notes: document.getElementById('notes'),
@@ -33,6 +34,7 @@ const elements = {
     sellForm: document.getElementById('sellForm'),
     sellHoldingId: document.getElementById('sellHoldingId'),
     sellPrice: document.getElementById('sellPrice'),
+    sellQuantity: document.getElementById('sellQuantity'),
     sellInfo: document.getElementById('sellInfo'),
     sellModalClose: document.getElementById('sellModalClose'),
     cancelSellBtn: document.getElementById('cancelSellBtn'),
@@ -161,13 +163,13 @@ function renderHoldings(holdings) {
         return `
         <div class="holding-card" data-id="${h.id}">
             <div class="holding-header">
-                <span class="holding-weight">${h.weight} gram</span>
+                <span class="holding-weight">${h.quantity > 1 ? `${h.quantity} × ` : ''}${h.weight} gram</span>
                 <span class="holding-badge">${h.notes || 'Gold'}</span>
             </div>
             <div class="holding-details">
                 <div class="holding-detail">
                     <span class="label">Cost</span>
-                    <span class="value">${formatRupiah(h.purchase_price)}</span>
+                    <span class="value">${formatRupiah(h.total_cost)}</span>
                 </div>
                 <div class="holding-detail">
                     <span class="label">Current Value</span>
@@ -209,11 +211,11 @@ function renderHistory(transactions) {
         <div class="history-card">
             <div class="history-icon ${t.type.toLowerCase()}">${t.type === 'BUY' ? '📥' : '📤'}</div>
             <div class="history-details">
-                <div class="history-title">${t.type === 'BUY' ? 'Bought' : 'Sold'} ${t.weight}g Gold</div>
+                <div class="history-title">${t.type === 'BUY' ? 'Bought' : 'Sold'} ${t.quantity > 1 ? `${t.quantity} × ` : ''}${t.weight}g Gold</div>
                 <div class="history-subtitle">${t.date}</div>
             </div>
             <div class="history-amount ${t.type.toLowerCase()}">
-                <div class="price">${t.type === 'BUY' ? '-' : '+'}${formatRupiah(t.price)}</div>
+                <div class="price">${t.type === 'BUY' ? '-' : '+'}${formatRupiah(t.price * (t.quantity || 1))}</div>
             </div>
         </div>
     `).join('');
@@ -241,6 +243,7 @@ function editHolding(id) {
     elements.submitBtn.textContent = 'Save Changes';
     elements.holdingId.value = holding.id;
     elements.weight.value = holding.weight;
+    elements.quantity.value = holding.quantity;
     elements.purchasePrice.value = holding.purchase_price;
     elements.purchaseDate.value = holding.purchase_date;
     elements.notes.value = holding.notes || '';
@@ -251,9 +254,12 @@ function openSellModal(id) {
     const holding = portfolioData.holdings.find(h => h.id === id);
     if (!holding) return;
 
+    const barBuy = holding.current_buy ? Math.round(holding.current_buy / holding.quantity) : 0;
     elements.sellHoldingId.value = id;
-    elements.sellPrice.value = holding.current_buy || '';
-    elements.sellInfo.textContent = `Selling ${holding.weight}g gold (Current buyback: ${formatRupiah(holding.current_buy)})`;
+    elements.sellQuantity.max = holding.quantity;
+    elements.sellQuantity.value = holding.quantity;
+    elements.sellPrice.value = barBuy || '';
+    elements.sellInfo.textContent = `Selling ${holding.weight}g gold, ${holding.quantity} bar(s) held (Current buyback: ${formatRupiah(barBuy)} per bar)`;
     elements.sellModalOverlay.classList.add('active');
 }
 
@@ -331,6 +337,7 @@ elements.holdingForm.addEventListener('submit', async (e) => {
 
     const holdingData = {
         weight: parseFloat(elements.weight.value),
+        quantity: parseInt(elements.quantity.value, 10) || 1,
         purchase_price: parseFloat(elements.purchasePrice.value),
         purchase_date: elements.purchaseDate.value,
         notes: elements.notes.value
@@ -365,12 +372,13 @@ elements.sellForm.addEventListener('submit', async (e) => {
 
     const id = elements.sellHoldingId.value;
     const sellPrice = parseFloat(elements.sellPrice.value);
+    const sellQuantity = parseInt(elements.sellQuantity.value, 10);
 
     try {
         const res = await fetch(`${API_BASE}/api/portfolio/holdings/${id}`, {
             method: 'DELETE',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ sell_price: sellPrice })
+            body: JSON.stringify({ sell_price: sellPrice, quantity: sellQuantity })
         });
 
         const data = await res.json();
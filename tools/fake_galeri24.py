@@ -0,0 +1,181 @@
+"""
+Fake Galeri24 server for Gold Portfolio Tracker
+Serves recorded harga-emas pages locally so the scraper, price cache and
+scheduler can be benchmarked and load-tested without network access.
+
+Usage:
+    python tools/fake_galeri24.py --port 8024 --latency 200 --error-rate 0.05
+    GALERI24_BASE_URL=http://127.0.0.1:8024 gunicorn app:app
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'pages')
+
+PRICE_RE = re.compile(r'Rp([\d.]+)')
+
+
+def shift_prices(html, step):
+    """Move every 'Rp1.234.000' on the page by step tenths of a percent"""
+    if not step:
+        return html
+
+    def shift(match):
+        value = int(match.group(1).replace('.', ''))
+        value = round(value * (1 + step / 1000) / 1000) * 1000
+        return 'Rp' + f"{value:,}".replace(',', '.')
+
+    return PRICE_RE.sub(shift, html)
+
+
+class FakeGaleri24:
+    """Page state shared by every request handler thread"""
+
+    def __init__(self, pages, latency=0.0, jitter=0.0, error_rate=0.0, stall_rate=0.0, stall=5.0,
+                 change_every=0.0, validators=True):
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.change_every = change_every
+        self.validators = validators
+        self.started = time.time()
+        self.counts = {'200': 0, '304': 0, '503': 0}
+        self._lock = threading.Lock()
+        self._rendered = {}  # version -> (body, etag, last_modified)
+
+    def version(self):
+        """Prices step once every change_every seconds; pages rotate with them"""
+        if not self.change_every:
+            return 0
+        return int((time.time() - self.started) // self.change_every)
+
+    def render(self):
+        version = self.version()
+        with self._lock:
+            if version not in self._rendered:
+                html = shift_prices(self.pages[version % len(self.pages)], version // len(self.pages))
+                body = html.encode('utf-8')
+                changed_at = self.started + version * self.change_every
+                self._rendered = {version: (body, f'"{hashlib.sha1(body).hexdigest()}"',
+                                            formatdate(changed_at, usegmt=True))}
+            return self._rendered[version]
+
+    def count(self, status):
+        with self._lock:
+            self.counts[status] += 1
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real site
+
+        def do_GET(self):
+            if self.path.split('?')[0].rstrip('/') != '/harga-emas':
+                self.send_error(404)
+                return
+
+            delay = max(0.0, random.gauss(state.latency, state.jitter))
+            if random.random() < state.stall_rate:
+                delay += state.stall
+            time.sleep(delay)
+
+            if random.random() < state.error_rate:
+                state.count('503')
+                self.send_error(503)
+                return
+
+            body, etag, last_modified = state.render()
+            if state.validators and (self.headers.get('If-None-Match') == etag or
+                                     self.headers.get('If-Modified-Since') == last_modified):
+                state.count('304')
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            state.count('200')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if state.validators:
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            # Write in pieces so streaming clients can hang up early
+            for i in range(0, len(body), 4096):
+                try:
+                    self.wfile.write(body[i:i + 4096])
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client hung up early, e.g. a streaming scrape
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8024)
+    parser.add_argument('--pages', nargs='*', help='recorded pages to serve, in rotation '
+                                                   '(default: benchmarks/pages/*.html)')
+    parser.add_argument('--latency', type=float, default=0, help='mean response delay in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='delay standard deviation in ms')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--stall-rate', type=float, default=0, help='fraction of requests that stall')
+    parser.add_argument('--stall', type=float, default=5000, help='extra delay of a stalled request in ms')
+    parser.add_argument('--change-every', type=float, default=0, help='seconds between price changes (0 = never)')
+    parser.add_argument('--no-validators', action='store_true', help='omit ETag/Last-Modified and never send 304')
+    args = parser.parse_args()
+
+    paths = args.pages or sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    if not pages:
+        raise SystemExit("No pages to serve")
+
+    state = FakeGaleri24(
+        pages,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall=args.stall / 1000,
+        change_every=args.change_every,
+        validators=not args.no_validators
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"🧪 Fake galeri24 serving {len(pages)} page(s) on http://{args.host}:{args.port}/harga-emas")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Responses: {state.counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Startup warm-up for Gold Portfolio Tracker
+Runs slow startup work (schema setup, first price load) in the background so
+the web process answers right away, and tracks when it is ready
+"""
+
+import os
+import threading
+import time
+
+# Seconds from process start to ready that we still consider a healthy cold start
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', 2.0))
+
+
+class WarmUp:
+    """Background startup steps plus a readiness flag
+
+    start() is idempotent and fork-aware: under gunicorn --preload the master
+    imports the app, and each forked worker starts its own warm-up thread on
+    its first request, since threads don't survive fork(). Startup is timed
+    from started in the process that created it, and from start() in forks.
+    """
+
+    def __init__(self, steps, budget=STARTUP_BUDGET, started=None):
+        self.steps = steps
+        self.budget = budget
+        self.started = started if started is not None else time.monotonic()
+        self.elapsed = None  # seconds from started to ready
+        self.error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._pid = None
+        self._created_pid = os.getpid()
+        # A lock held by some thread at fork() would never be released in the child
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def ready(self):
+        return self._pid == os.getpid() and self._ready.is_set()
+
+    def start(self):
+        """Run the steps in a background thread, once per process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if os.getpid() != self._created_pid:
+                self.started = time.monotonic()  # forked worker: time its own warm-up
+            self._pid = os.getpid()
+            self._ready = threading.Event()
+            self.error = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Block until ready; returns whether it got there in time"""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "startup_seconds": round(self.elapsed, 3) if self.elapsed is not None else None,
+            "startup_budget": self.budget,
+            "error": self.error
+        }
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _run(self):
+        for step in self.steps:
+            while True:
+                try:
+                    step()
+                    break
+                except Exception as e:
+                    # Stay unready and keep trying, e.g. while the database is unreachable
+                    self.error = f"{getattr(step, '__name__', step)}: {e}"
+                    print(f"❌ Warm-up error in {self.error}")
+                    time.sleep(5)
+
+        self.error = None
+        self.elapsed = time.monotonic() - self.started
+        self._ready.set()
+        if self.elapsed > self.budget:
+            print(f"⚠️  Ready in {self.elapsed:.2f}s, over the {self.budget:.2f}s startup budget")
+        else:
+            print(f"✅ Ready in {self.elapsed:.2f}s")